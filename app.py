@@ -1,38 +1,149 @@
 """Servidor Flask para coleta e visualização das declarações EFD-REINF."""
 
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, stream_with_context
 import sqlite3
 import json
+import csv
+import io
+import math
+import os
+import time
+import uuid
+from itertools import islice
+
+import metricas
+import particoes
+from gravacao import GravadorAgrupado
+from particoes import COLUNAS_DECLARACAO, ParticaoArquivada, chave_filtro
+import delta
+from cache_entrada import carregar_grupos
+from entrada import grupo_para_registros, hash_grupo
+from valores import para_centavos, formatar_centavos
+
+DB_PATH = particoes.DB_PATH
+# Linhas lidas do cursor por vez na listagem em streaming
+TAMANHO_LOTE_API = 500
+COLUNAS_JSON = ('dependentes', 'planos_saude', 'dependentes_planos')
+
+# Coordenador de lotes para workers de automação em vários hosts
+LEASE_TIMEOUT_PADRAO = 300
+MAX_TENTATIVAS_COORDENADOR = int(os.environ.get('MAX_TENTATIVAS', '3'))
+JANELA_VAZAO = 60
+# Único diretório de onde /coordenador/carregar aceita planilhas (o cache é gravado ao lado delas)
+DIRETORIO_ENTRADA = os.path.realpath(os.environ.get('DIRETORIO_ENTRADA', '.'))
+EXTENSOES_ENTRADA = ('.csv', '.xlsx', '.xls')
+
+# Gravação agrupada (group commit) do submit_efd; ligue com GRAVACAO_AGRUPADA=1
+GRAVACAO_AGRUPADA = os.environ.get('GRAVACAO_AGRUPADA', '0') == '1'
+JANELA_GRAVACAO_MS = float(os.environ.get('JANELA_GRAVACAO_MS', '1'))
+LOTE_GRAVACAO_MAX = int(os.environ.get('LOTE_GRAVACAO_MAX', '256'))
 
 app = Flask(__name__)
+# Middleware de métricas (/metrics); desligue com METRICAS_ATIVAS=0
+app.config['METRICAS_ATIVAS'] = os.environ.get('METRICAS_ATIVAS', '1') != '0'
+metricas.instalar(app)
+app.config['GRAVACAO_AGRUPADA'] = GRAVACAO_AGRUPADA
+
+# Colunas em centavos inteiros adicionadas depois da criação original da tabela
+COLUNAS_CENTAVOS = {
+    'valor_titular_centavos': 'INTEGER NOT NULL DEFAULT 0',
+    'valor_dependentes_centavos': 'INTEGER NOT NULL DEFAULT 0',
+}
 
-def formatar_valor(valor):
-    """Formata valores monetários para o padrão brasileiro com duas casas."""
+def converter_planos(planos_json):
+    """Acrescenta ``valor_centavos`` a cada item e devolve (json, total em centavos)."""
     try:
-        if isinstance(valor, str):
-            valor = valor.replace(',', '.')
-        valor_float = float(valor)
-        return f"{valor_float:.2f}".replace('.', ',')
+        itens = json.loads(planos_json) if planos_json else []
     except (ValueError, TypeError):
-        return '0,00'
+        return planos_json, 0
+    total = 0
+    for item in itens:
+        item['valor_centavos'] = para_centavos(item.get('valor'))
+        total += item['valor_centavos']
+    return json.dumps(itens, ensure_ascii=False), total
+
+def valor_centavos(item):
+    """Lê os centavos de um item salvo, convertendo registros antigos sem a chave."""
+    if 'valor_centavos' in item:
+        return item['valor_centavos']
+    return para_centavos(item.get('valor'))
+
+def migrar_centavos(cursor):
+    """Adiciona as colunas em centavos e preenche as declarações já existentes."""
+    cursor.execute('PRAGMA table_info(efd_declaracoes)')
+    existentes = {coluna[1] for coluna in cursor.fetchall()}
+    faltantes = [nome for nome in COLUNAS_CENTAVOS if nome not in existentes]
+    if not faltantes:
+        return
+    
+    for nome in faltantes:
+        cursor.execute(f'ALTER TABLE efd_declaracoes ADD COLUMN {nome} {COLUNAS_CENTAVOS[nome]}')
+    
+    cursor.execute('SELECT id, planos_saude, dependentes_planos FROM efd_declaracoes')
+    atualizacoes = []
+    for declaracao_id, planos_saude, dependentes_planos in cursor.fetchall():
+        planos_saude, total_titular = converter_planos(planos_saude)
+        dependentes_planos, total_dependentes = converter_planos(dependentes_planos)
+        atualizacoes.append((planos_saude, dependentes_planos, total_titular, total_dependentes, declaracao_id))
+    cursor.executemany('''
+        UPDATE efd_declaracoes
+        SET planos_saude = ?, dependentes_planos = ?,
+            valor_titular_centavos = ?, valor_dependentes_centavos = ?
+        WHERE id = ?
+    ''', atualizacoes)
+
+def fabrica_conexao():
+    """Classe de conexão a usar: cronometrada se as métricas estiverem ativas."""
+    return metricas.ConexaoMedida if app.config['METRICAS_ATIVAS'] else sqlite3.Connection
+
+def conectar():
+    """Abre a conexão com o banco principal (catálogo de partições e coordenador)."""
+    return sqlite3.connect(DB_PATH, factory=fabrica_conexao())
+
+def registrar_lote_gravado(quantidade, segundos):
+    """Alimenta as métricas de tamanho e duração dos lotes da gravação agrupada."""
+    if app.config['METRICAS_ATIVAS']:
+        metricas.tamanho_lotes_gravacao.observar(quantidade)
+        metricas.duracao_lotes_gravacao.observar(segundos)
+
+gravador = GravadorAgrupado(
+    conectar, espera=JANELA_GRAVACAO_MS / 1000, tamanho_maximo=LOTE_GRAVACAO_MAX, ao_gravar=registrar_lote_gravado
+)
 
 def init_db():
-    """Cria a tabela principal do SQLite caso ainda não exista."""
-    conn = sqlite3.connect('cadastros.db')
+    """Cria as tabelas do banco principal e move a tabela única antiga para as partições."""
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
+    particoes.init_catalogo(cursor)
+    delta.init_tabela(cursor)
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'efd_declaracoes'")
+    if cursor.fetchone():
+        migrar_centavos(cursor)
+        conn.commit()
+        migradas = particoes.migrar_legado(conn)
+        print(f"📦 {migradas} declaração(ões) movida(s) para as partições por competência")
+    
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS efd_declaracoes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            data TEXT NOT NULL,
-            cnpj TEXT NOT NULL,
-            cpf TEXT NOT NULL,
-            dependentes TEXT,
-            planos_saude TEXT,
-            dependentes_planos TEXT,
-            data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        CREATE TABLE IF NOT EXISTS coordenador_grupos (
+            indice INTEGER PRIMARY KEY,
+            cpf_titular TEXT NOT NULL,
+            grupo TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            lease_id TEXT,
+            worker TEXT,
+            expira_em REAL,
+            disponivel_em REAL NOT NULL DEFAULT 0,
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            falha TEXT,
+            concluido_em REAL,
+            hash TEXT
         )
     ''')
+    cursor.execute('PRAGMA table_info(coordenador_grupos)')
+    if 'hash' not in {coluna[1] for coluna in cursor.fetchall()}:
+        cursor.execute('ALTER TABLE coordenador_grupos ADD COLUMN hash TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_coordenador_status ON coordenador_grupos (status, indice)')
     
     conn.commit()
     conn.close()
@@ -60,15 +171,34 @@ def submit_efd():
     planos_saude = request.form.get('planos_saude', '[]')
     dependentes_planos = request.form.get('dependentes_planos', '[]')
     
-    # Salvar no banco de dados
-    conn = sqlite3.connect('cadastros.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO efd_declaracoes (data, cnpj, cpf, dependentes, planos_saude, dependentes_planos)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (data, cnpj, cpf, dependentes, planos_saude, dependentes_planos))
-    conn.commit()
-    conn.close()
+    # Converter valores para centavos uma única vez, na entrada
+    try:
+        planos_saude, valor_titular_centavos = converter_planos(planos_saude)
+        dependentes_planos, valor_dependentes_centavos = converter_planos(dependentes_planos)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    registro = {
+        'data': data, 'cnpj': cnpj, 'cpf': cpf,
+        'dependentes': dependentes, 'planos_saude': planos_saude, 'dependentes_planos': dependentes_planos,
+        'valor_titular_centavos': valor_titular_centavos,
+        'valor_dependentes_centavos': valor_dependentes_centavos
+    }
+    
+    # Salvar na partição da competência (no modo agrupado, espera o commit do lote)
+    try:
+        if app.config['GRAVACAO_AGRUPADA']:
+            gravador.gravar(registro)
+        else:
+            conn = conectar()
+            try:
+                particoes.inserir_declaracao(conn, registro)
+            finally:
+                conn.close()
+    except ParticaoArquivada as e:
+        return jsonify({'error': str(e)}), 409
+    except TimeoutError as e:
+        return jsonify({'error': str(e)}), 503
     
     return redirect(url_for('sucesso_efd'))
 
@@ -79,11 +209,17 @@ def sucesso_efd():
 
 @app.route('/visualizar_efd')
 def visualizar_efd():
-    """Lista todas as declarações registradas para consulta."""
-    conn = sqlite3.connect('cadastros.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM efd_declaracoes ORDER BY id DESC')
-    declaracoes = cursor.fetchall()
+    """Lista as declarações registradas, de todas as competências ou só de ``?competencia=``."""
+    competencia = request.args.get('competencia')
+    try:
+        chaves = [chave_filtro(competencia)] if competencia else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    conn = conectar()
+    declaracoes = list(particoes.consultar_ordenado(
+        conn, 'SELECT * FROM efd_declaracoes ORDER BY id DESC',
+        chaves=chaves, decrescente=True, factory=fabrica_conexao()
+    ))
     conn.close()
     return render_template('view.html', declaracoes=declaracoes)
 
@@ -92,31 +228,38 @@ def visualizar_efd():
 def detalhes_efd(declaracao_id):
     """Retorna os detalhes enriquecidos de uma declaração específica."""
     try:
-        conn = sqlite3.connect('cadastros.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM efd_declaracoes WHERE id = ?', (declaracao_id,))
-        declaracao = cursor.fetchone()
+        conn = conectar()
+        local = particoes.localizar(conn, declaracao_id)
         conn.close()
         
+        declaracao = None
+        if local:
+            particao = particoes.abrir_particao(*local, factory=fabrica_conexao())
+            cursor = particao.cursor()
+            cursor.execute('SELECT * FROM efd_declaracoes WHERE id = ?', (declaracao_id,))
+            declaracao = cursor.fetchone()
+            particao.close()
+        
         if not declaracao:
             return jsonify({'error': 'Declaração não encontrada'}), 404
         
-        # Estrutura: id, data, cnpj, cpf, dependentes, planos_saude, dependentes_planos, data_cadastro
+        # Estrutura: id, data, cnpj, cpf, dependentes, planos_saude, dependentes_planos, data_cadastro,
+        #            valor_titular_centavos, valor_dependentes_centavos
         dependentes = json.loads(declaracao[4]) if declaracao[4] else []
         planos_saude = json.loads(declaracao[5]) if declaracao[5] else []
         dependentes_planos = json.loads(declaracao[6]) if declaracao[6] else []
         
         # Valor do titular (primeiro plano de saúde)
-        valor_titular = formatar_valor(planos_saude[0]['valor']) if planos_saude else '0,00'
+        valor_titular = formatar_centavos(valor_centavos(planos_saude[0])) if planos_saude else '0,00'
         
         # Combinar dependentes com valores
+        valores_por_cpf = {}
+        for dp in dependentes_planos:
+            valores_por_cpf.setdefault(dp['cpf'], valor_centavos(dp))
+        
         dependentes_completos = []
         for dep in dependentes:
-            valor_dependente = '0,00'
-            for dp in dependentes_planos:
-                if dp['cpf'] == dep['cpf']:
-                    valor_dependente = formatar_valor(dp['valor'])
-                    break
+            valor_dependente = formatar_centavos(valores_por_cpf.get(dep['cpf'], 0))
             
             dependentes_completos.append({
                 'cpf': dep['cpf'],
@@ -137,6 +280,347 @@ def detalhes_efd(declaracao_id):
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
+def _ler_em_lotes(where, parametros, chaves=None):
+    """Gera as declarações filtradas em ordem de id, em lotes, intercalando as partições."""
+    conn = conectar()
+    try:
+        linhas = particoes.consultar_ordenado(
+            conn,
+            f'SELECT {", ".join(COLUNAS_DECLARACAO)} FROM efd_declaracoes {where} ORDER BY id',
+            parametros, chaves=chaves, factory=fabrica_conexao()
+        )
+        while True:
+            lote = list(islice(linhas, TAMANHO_LOTE_API))
+            if not lote:
+                break
+            yield lote
+    finally:
+        conn.close()
+
+def _gerar_ndjson(lotes):
+    """Serializa cada declaração como uma linha JSON."""
+    for lote in lotes:
+        linhas = []
+        for declaracao in lote:
+            registro = dict(zip(COLUNAS_DECLARACAO, declaracao))
+            for coluna in COLUNAS_JSON:
+                try:
+                    registro[coluna] = json.loads(registro[coluna]) if registro[coluna] else []
+                except ValueError:
+                    pass
+            linhas.append(json.dumps(registro, ensure_ascii=False))
+        yield '\n'.join(linhas) + '\n'
+
+def _gerar_csv(lotes):
+    """Serializa as declarações em CSV reaproveitando um único buffer."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUNAS_DECLARACAO)
+    yield buffer.getvalue()
+    for lote in lotes:
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows(lote)
+        yield buffer.getvalue()
+
+@app.route('/api/declaracoes')
+def api_declaracoes():
+    """Lista as declarações em streaming (NDJSON ou CSV) para outros sistemas.
+
+    Filtros opcionais: ``competencia`` (campo ``data``, ex. ``01/2025``),
+    ``cnpj`` e ``since_id`` (apenas ids maiores, para sincronização
+    incremental). O formato é escolhido por ``formato=ndjson|csv``.
+    """
+    formato = request.args.get('formato', 'ndjson').lower()
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({'error': "Formato inválido: use 'ndjson' ou 'csv'"}), 400
+    
+    try:
+        since_id = int(request.args.get('since_id', 0))
+    except ValueError:
+        return jsonify({'error': 'since_id deve ser um número inteiro'}), 400
+    
+    condicoes = ['id > ?']
+    parametros = [since_id]
+    competencia = request.args.get('competencia')
+    try:
+        chaves = [chave_filtro(competencia)] if competencia else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    cnpj = request.args.get('cnpj')
+    if cnpj:
+        condicoes.append('cnpj = ?')
+        parametros.append(cnpj)
+    
+    lotes = _ler_em_lotes('WHERE ' + ' AND '.join(condicoes), parametros, chaves)
+    # stream_with_context mantém a requisição aberta até o fim do corpo, então
+    # o teardown das métricas mede o streaming inteiro e não só a montagem
+    if formato == 'csv':
+        return Response(stream_with_context(_gerar_csv(lotes)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=efd_declaracoes.csv'})
+    return Response(stream_with_context(_gerar_ndjson(lotes)), mimetype='application/x-ndjson')
+
+def resolver_planilha(arquivo):
+    """Caminho da planilha dentro de ``DIRETORIO_ENTRADA``; ``ValueError`` se estiver fora dele."""
+    caminho = os.path.realpath(os.path.join(DIRETORIO_ENTRADA, str(arquivo)))
+    if os.path.commonpath([caminho, DIRETORIO_ENTRADA]) != DIRETORIO_ENTRADA:
+        raise ValueError(f'Arquivo fora do diretório de entrada: {arquivo}')
+    if not caminho.lower().endswith(EXTENSOES_ENTRADA):
+        raise ValueError(f"Formato não suportado: use {', '.join(EXTENSOES_ENTRADA)}")
+    return caminho
+
+def inteiro_do_payload(payload, chave, padrao):
+    """Lê um inteiro (mínimo 1) do JSON; ``ValueError`` com mensagem amigável se não for número."""
+    try:
+        return max(1, int(payload.get(chave, padrao)))
+    except (TypeError, ValueError):
+        raise ValueError(f'{chave} deve ser um número inteiro') from None
+
+def decimal_do_payload(payload, chave, padrao):
+    """Lê um número real (mínimo 0) do JSON; ``ValueError`` se não for um número finito."""
+    try:
+        valor = float(payload.get(chave, padrao))
+    except (TypeError, ValueError):
+        valor = math.nan
+    if not math.isfinite(valor):
+        raise ValueError(f'{chave} deve ser um número')
+    return max(0.0, valor)
+
+@app.route('/coordenador/carregar', methods=['POST'])
+def coordenador_carregar():
+    """Agrupa a planilha uma única vez e grava os grupos a distribuir entre os workers.
+
+    Por padrão só entram no lote os grupos novos ou alterados desde o último
+    envio; ``delta=false`` distribui todos. ``arquivo`` é relativo a
+    ``DIRETORIO_ENTRADA`` e não pode sair dele.
+    """
+    payload = request.get_json(silent=True) or {}
+    arquivo = payload.get('arquivo', 'dados_ficticios.csv')
+    try:
+        caminho = resolver_planilha(arquivo)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not os.path.isfile(caminho):
+        return jsonify({'error': f'Arquivo não encontrado: {arquivo}'}), 404
+    
+    conn = conectar()
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM coordenador_grupos')
+    existentes = cursor.fetchone()[0]
+    if existentes and not payload.get('reiniciar'):
+        conn.close()
+        return jsonify({'error': f'Já existe um lote com {existentes} grupo(s); envie reiniciar=true'}), 409
+    
+    try:
+        grupos = carregar_grupos(caminho)
+    except ValueError as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 400
+    resumo = None
+    if payload.get('delta', True):
+        hashes_grupos, indices, resumo = delta.comparar(grupos, delta.carregar_hashes(conn))
+        print(delta.formatar_resumo(resumo))
+    else:
+        hashes_grupos, indices = [hash_grupo(grupo) for grupo in grupos], range(len(grupos))
+    
+    cursor.execute('DELETE FROM coordenador_grupos')
+    cursor.executemany(
+        'INSERT INTO coordenador_grupos (indice, cpf_titular, grupo, hash) VALUES (?, ?, ?, ?)',
+        (
+            (indice, str(grupos[indice][0]['CPF']),
+             json.dumps(grupo_para_registros(grupos[indice]), ensure_ascii=False), hashes_grupos[indice])
+            for indice in indices
+        )
+    )
+    conn.commit()
+    conn.close()
+    return jsonify({'grupos': len(indices), 'total_planilha': len(grupos), 'delta': resumo})
+
+@app.route('/coordenador/lease', methods=['POST'])
+def coordenador_lease():
+    """Entrega ao worker até ``quantidade`` grupos pendentes ou com lease expirado."""
+    payload = request.get_json(silent=True) or {}
+    worker = payload.get('worker', request.remote_addr)
+    try:
+        quantidade = inteiro_do_payload(payload, 'quantidade', 1)
+        timeout = inteiro_do_payload(payload, 'timeout', LEASE_TIMEOUT_PADRAO)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    agora = time.time()
+    lease_id = uuid.uuid4().hex
+    
+    conn = conectar()
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    try:
+        # BEGIN IMMEDIATE garante que dois workers não recebam o mesmo grupo
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            UPDATE coordenador_grupos
+            SET status = 'falha', falha = 'lease_expirado', lease_id = NULL
+            WHERE status = 'arrendado' AND expira_em < ? AND tentativas >= ?
+        ''', (agora, MAX_TENTATIVAS_COORDENADOR))
+        cursor.execute('''
+            SELECT indice, grupo, tentativas FROM coordenador_grupos
+            WHERE (status = 'pendente' AND disponivel_em <= ?)
+               OR (status = 'arrendado' AND expira_em < ?)
+            ORDER BY indice
+            LIMIT ?
+        ''', (agora, agora, quantidade))
+        selecionados = cursor.fetchall()
+        cursor.executemany('''
+            UPDATE coordenador_grupos
+            SET status = 'arrendado', lease_id = ?, worker = ?, expira_em = ?, tentativas = tentativas + 1
+            WHERE indice = ?
+        ''', [(lease_id, worker, agora + timeout, indice) for indice, _, _ in selecionados])
+        cursor.execute("SELECT COUNT(*) FROM coordenador_grupos WHERE status IN ('pendente', 'arrendado')")
+        restantes = cursor.fetchone()[0]
+        cursor.execute('COMMIT')
+    except sqlite3.Error:
+        cursor.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    
+    return jsonify({
+        'lease_id': lease_id if selecionados else None,
+        'expira_em': agora + timeout,
+        'restantes': restantes,
+        'grupos': [
+            {'indice': indice, 'tentativas': tentativas + 1, 'grupo': json.loads(grupo)}
+            for indice, grupo, tentativas in selecionados
+        ]
+    })
+
+@app.route('/coordenador/renovar', methods=['POST'])
+def coordenador_renovar():
+    """Prorroga os grupos ainda em aberto de um lease ativo."""
+    payload = request.get_json(silent=True) or {}
+    try:
+        timeout = inteiro_do_payload(payload, 'timeout', LEASE_TIMEOUT_PADRAO)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    conn = conectar()
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE coordenador_grupos SET expira_em = ?
+        WHERE lease_id = ? AND status = 'arrendado'
+    ''', (time.time() + timeout, payload.get('lease_id')))
+    renovados = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return jsonify({'renovados': renovados})
+
+@app.route('/coordenador/resultado', methods=['POST'])
+def coordenador_resultado():
+    """Registra o resultado de um grupo; falhas transitórias voltam para a fila."""
+    payload = request.get_json(silent=True) or {}
+    indice = payload.get('indice')
+    try:
+        espera = decimal_do_payload(payload, 'espera', 0)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    agora = time.time()
+    
+    conn = conectar()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT tentativas, cpf_titular, hash FROM coordenador_grupos
+        WHERE indice = ? AND lease_id = ? AND status = 'arrendado'
+    ''', (indice, payload.get('lease_id')))
+    linha = cursor.fetchone()
+    if not linha:
+        conn.close()
+        return jsonify({'error': 'Lease expirado ou grupo já reatribuído'}), 409
+    
+    if payload.get('sucesso'):
+        cursor.execute('''
+            UPDATE coordenador_grupos
+            SET status = 'concluido', falha = NULL, lease_id = NULL, concluido_em = ?
+            WHERE indice = ?
+        ''', (agora, indice))
+        status = 'concluido'
+        if linha[2]:
+            delta.registrar_envios(conn, [(linha[1], linha[2])])
+    else:
+        falha = payload.get('classe') or 'desconhecida'
+        if payload.get('reprocessar') and linha[0] < MAX_TENTATIVAS_COORDENADOR:
+            status = 'pendente'
+            disponivel_em = agora + espera
+        else:
+            status = 'falha'
+            disponivel_em = 0
+        cursor.execute('''
+            UPDATE coordenador_grupos
+            SET status = ?, falha = ?, lease_id = NULL, disponivel_em = ?,
+                concluido_em = CASE WHEN ? = 'falha' THEN ? END
+            WHERE indice = ?
+        ''', (status, falha, disponivel_em, status, agora, indice))
+    conn.commit()
+    conn.close()
+    return jsonify({'indice': indice, 'status': status})
+
+@app.route('/coordenador/status')
+def coordenador_status():
+    """Resumo do lote: grupos por situação, vazão recente e por worker."""
+    agora = time.time()
+    conn = conectar()
+    cursor = conn.cursor()
+    cursor.execute('SELECT status, COUNT(*) FROM coordenador_grupos GROUP BY status')
+    por_status = dict(cursor.fetchall())
+    cursor.execute('''
+        SELECT COUNT(*), MIN(concluido_em) FROM coordenador_grupos
+        WHERE status = 'concluido'
+    ''')
+    concluidos, primeiro = cursor.fetchone()
+    cursor.execute('''
+        SELECT COUNT(*) FROM coordenador_grupos
+        WHERE status = 'concluido' AND concluido_em >= ?
+    ''', (agora - JANELA_VAZAO,))
+    recentes = cursor.fetchone()[0]
+    cursor.execute('''
+        SELECT worker, COUNT(*) FROM coordenador_grupos
+        WHERE status = 'concluido' GROUP BY worker ORDER BY worker
+    ''')
+    por_worker = dict(cursor.fetchall())
+    conn.close()
+    
+    vazao_recente = recentes * 60 / JANELA_VAZAO
+    restantes = por_status.get('pendente', 0) + por_status.get('arrendado', 0)
+    return jsonify({
+        'total': sum(por_status.values()),
+        'por_status': por_status,
+        'grupos_por_minuto': round(vazao_recente, 2),
+        'grupos_por_minuto_total': round(concluidos * 60 / max(agora - primeiro, 1), 2) if primeiro else 0,
+        'estimativa_restante_min': round(restantes / vazao_recente, 1) if vazao_recente else None,
+        'por_worker': por_worker
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Expõe latências, tempo de SQLite e tamanho do banco no formato do Prometheus."""
+    if not app.config['METRICAS_ATIVAS']:
+        return Response('Métricas desativadas\n', status=404, mimetype='text/plain')
+    
+    linhas = metricas.duracao_requisicoes.exportar()
+    linhas += metricas.duracao_sqlite.exportar()
+    linhas += metricas.requisicoes_em_andamento.exportar()
+    linhas += metricas.tamanho_lotes_gravacao.exportar()
+    linhas += metricas.duracao_lotes_gravacao.exportar()
+    
+    linhas += metricas.exportar_medidor(
+        'efd_db_size_bytes', 'Tamanho do cadastros.db somado ao das partições.', particoes.tamanho_total()
+    )
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        total = conn.execute('SELECT COUNT(*) FROM efd_indice').fetchone()[0]
+        conn.close()
+    except sqlite3.Error:
+        total = 0
+    linhas += metricas.exportar_medidor('efd_declaracoes_total', 'Declarações gravadas em efd_declaracoes.', total)
+    
+    return Response('\n'.join(linhas) + '\n', mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     init_db()
     print("🚀 Servidor rodando em: http://localhost:5000")
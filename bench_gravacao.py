@@ -0,0 +1,222 @@
+"""
+Benchmark da gravação agrupada (group commit) do ``submit_efd``.
+
+Compara um commit por declaração com o ``GravadorAgrupado`` em várias
+janelas de espera, com ``--threads`` escritores concorrentes:
+
+- ``armazenamento``: chama ``particoes.inserir_declaracao`` / ``gravar`` direto;
+- ``http``: faz POST em ``/submit_efd`` num servidor werkzeug com threads,
+  no mesmo processo.
+
+Roda num diretório temporário (o ``cadastros.db`` e ``particoes/`` reais não
+são tocados), ex.: ``python bench_gravacao.py --modo ambos --total 4000``.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+DIRETORIO_CODIGO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, DIRETORIO_CODIGO)
+
+import particoes
+from gravacao import GravadorAgrupado
+
+REGISTRO = {
+    'data': '01/2025', 'cnpj': '10.000.000/0001-00', 'cpf': '123.456.789-00',
+    'dependentes': '[]', 'planos_saude': '[]', 'dependentes_planos': '[]',
+    'valor_titular_centavos': 1000, 'valor_dependentes_centavos': 0
+}
+FORMULARIO = {
+    'data': '01/2025', 'cnpj': '10.000.000/0001-00', 'cpf': '123.456.789-00', 'dependentes': '[]',
+    'planos_saude': json.dumps([{'cnpj': '10.000.000/0001-00', 'valor': '10,00'}]), 'dependentes_planos': '[]'
+}
+
+
+def recriar_banco():
+    """Apaga o banco do diretório atual e recria já com a partição de ``REGISTRO``.
+
+    A partição é criada antes da medição para que só as inserções contem.
+    """
+    from app import init_db
+    if os.path.exists(particoes.DB_PATH):
+        os.remove(particoes.DB_PATH)
+    shutil.rmtree(particoes.DIRETORIO_PARTICOES, ignore_errors=True)
+    init_db()
+    conn = sqlite3.connect(particoes.DB_PATH)
+    try:
+        particoes.garantir_particao(conn, particoes.chave_competencia(REGISTRO['data']))
+    finally:
+        conn.close()
+
+
+def contar_gravadas():
+    """Total de declarações gravadas (pelo índice global de ids)."""
+    conn = sqlite3.connect(particoes.DB_PATH)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM efd_indice').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def medir(operacao, total, threads):
+    """Executa ``operacao`` ``total`` vezes divididas entre ``threads``; retorna (segundos, erros)."""
+    erros = []
+    lock = threading.Lock()
+
+    def escritor(quantidade):
+        for _ in range(quantidade):
+            try:
+                operacao()
+            except Exception as e:
+                with lock:
+                    erros.append(e)
+
+    porcoes = [total // threads + (1 if i < total % threads else 0) for i in range(threads)]
+    escritores = [threading.Thread(target=escritor, args=(porcao,)) for porcao in porcoes]
+    inicio = time.perf_counter()
+    for escritor_thread in escritores:
+        escritor_thread.start()
+    for escritor_thread in escritores:
+        escritor_thread.join()
+    return time.perf_counter() - inicio, erros
+
+
+def imprimir(rotulo, segundos, lotes=None, erros=()):
+    """Imprime uma linha da tabela de resultados."""
+    gravadas = contar_gravadas()
+    linha = f"  {rotulo:32s} {gravadas / segundos:8.0f} inserts/s"
+    if lotes:
+        linha += f"  (lote médio {sum(lotes) / len(lotes):5.1f}, {len(lotes)} commits)"
+    if erros:
+        linha += f"  ⚠️ {len(erros)} erro(s): {erros[0]!r}"
+    print(linha)
+
+
+def bench_armazenamento(total, threads, janelas):
+    """Mede só a camada de gravação, sem HTTP."""
+    print(f"\n📦 Armazenamento: {threads} escritores, {total} declarações")
+
+    recriar_banco()
+
+    def individual():
+        conn = sqlite3.connect(particoes.DB_PATH, timeout=30)
+        try:
+            particoes.inserir_declaracao(conn, REGISTRO)
+        finally:
+            conn.close()
+
+    segundos, erros = medir(individual, total, threads)
+    imprimir("um commit por declaração", segundos, erros=erros)
+
+    for janela in janelas:
+        recriar_banco()
+        lotes = []
+        gravador = GravadorAgrupado(
+            lambda: sqlite3.connect(particoes.DB_PATH, timeout=30),
+            espera=janela / 1000, ao_gravar=lambda quantidade, _segundos: lotes.append(quantidade)
+        )
+        try:
+            segundos, erros = medir(lambda: gravador.gravar(REGISTRO), total, threads)
+        finally:
+            gravador.parar()
+        imprimir(f"agrupado, janela {janela:g} ms", segundos, lotes, erros)
+
+
+class _SemRedirecionar(urllib.request.HTTPRedirectHandler):
+    """Trata o 302 de ``/submit_efd`` como resposta final (não segue para ``/sucesso_efd``)."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def bench_http(total, threads, janelas, porta):
+    """Mede ``POST /submit_efd`` num servidor werkzeug com threads."""
+    import app
+    from werkzeug.serving import make_server
+
+    print(f"\n🌐 HTTP: {threads} clientes, {total} requisições em /submit_efd")
+    app.app.config['METRICAS_ATIVAS'] = False
+    # sem o log de cada requisição, que domina o tempo e a saída
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    servidor = make_server('127.0.0.1', porta, app.app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    url = f"http://127.0.0.1:{porta}/submit_efd"
+    corpo = urllib.parse.urlencode(FORMULARIO).encode('utf-8')
+    cliente = urllib.request.build_opener(_SemRedirecionar)
+
+    def enviar():
+        try:
+            cliente.open(url, corpo, timeout=60).close()
+        except urllib.error.HTTPError as e:
+            if e.code != 302:
+                raise
+
+    try:
+        recriar_banco()
+        app.app.config['GRAVACAO_AGRUPADA'] = False
+        segundos, erros = medir(enviar, total, threads)
+        imprimir("um commit por declaração", segundos, erros=erros)
+
+        app.app.config['GRAVACAO_AGRUPADA'] = True
+        for janela in janelas:
+            recriar_banco()
+            lotes = []
+            app.gravador = GravadorAgrupado(
+                app.conectar, espera=janela / 1000, tamanho_maximo=app.LOTE_GRAVACAO_MAX,
+                ao_gravar=lambda quantidade, _segundos: lotes.append(quantidade)
+            )
+            try:
+                segundos, erros = medir(enviar, total, threads)
+            finally:
+                app.gravador.parar()
+            imprimir(f"agrupado, janela {janela:g} ms", segundos, lotes, erros)
+    finally:
+        servidor.shutdown()
+
+
+def criar_parser():
+    """Argumentos de linha de comando do benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark da gravação agrupada (group commit)")
+    parser.add_argument('--modo', choices=('armazenamento', 'http', 'ambos'), default='ambos')
+    parser.add_argument('--total', type=int, default=4000, help="declarações por cenário (padrão: 4000)")
+    parser.add_argument('--threads', type=int, default=32, help="escritores concorrentes (padrão: 32)")
+    parser.add_argument('--janelas', type=float, nargs='+', default=[0, 1, 2, 5, 10, 20],
+                        help="janelas de espera do gravador, em ms")
+    parser.add_argument('--porta', type=int, default=5099, help="porta do servidor no modo http")
+    parser.add_argument('--diretorio', help="onde criar o banco; cadastros.db e particoes/ dele são APAGADOS (padrão: diretório temporário)")
+    return parser
+
+
+def main():
+    """Roda os cenários pedidos num diretório isolado."""
+    args = criar_parser().parse_args()
+    diretorio = args.diretorio or tempfile.mkdtemp(prefix='bench_gravacao_')
+    os.makedirs(diretorio, exist_ok=True)
+    original = os.getcwd()
+    os.chdir(diretorio)
+    print(f"📂 Banco de teste em {diretorio}")
+    try:
+        if args.modo in ('armazenamento', 'ambos'):
+            bench_armazenamento(args.total, args.threads, args.janelas)
+        if args.modo in ('http', 'ambos'):
+            bench_http(args.total, args.threads, args.janelas, args.porta)
+    finally:
+        os.chdir(original)
+        if not args.diretorio:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Cache da planilha de entrada já limpa e agrupada, guardado ao lado do arquivo.
+
+Ler um XLSX grande com openpyxl e refazer ``limpar_dataframe`` e
+``converter_valores`` a cada execução (inclusive a cada retomada depois de
+uma queda) leva minutos. Aqui o resultado é salvo uma vez como Parquet, lido
+com memory map quando o ``pyarrow`` está instalado, ou como pickle do
+pandas. O cache vale enquanto caminho, tamanho, mtime e hash do conteúdo da
+planilha forem os mesmos registrados em ``<planilha>.cache.json``.
+"""
+
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from entrada import converter_valores, ler_planilha, limpar_dataframe
+
+try:
+    import pyarrow  # noqa: F401  (só para saber se o Parquet está disponível)
+except ImportError:
+    pyarrow = None
+
+# Incrementar quando mudar a limpeza/conversão, para descartar caches antigos
+VERSAO_CACHE = 2
+COLUNA_GRUPO = '_GRUPO'
+SUFIXO_CACHE = '.cache'
+EXTENSOES_CACHE = ('.json', '.parquet', '.pkl')
+
+
+def caminho_cache(caminho, extensao):
+    """Arquivo de cache de ``caminho`` com a extensão indicada (``.json``, ``.parquet``...)."""
+    return f"{caminho}{SUFIXO_CACHE}{extensao}"
+
+
+def hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """SHA-256 do conteúdo do arquivo, lido em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def impressao_digital(caminho, com_hash=True):
+    """Identifica a versão da planilha: caminho absoluto, tamanho, mtime e hash."""
+    info = os.stat(caminho)
+    digital = {
+        'versao': VERSAO_CACHE,
+        'caminho': os.path.abspath(caminho),
+        'tamanho': info.st_size,
+        'mtime_ns': info.st_mtime_ns,
+    }
+    if com_hash:
+        digital['sha256'] = hash_arquivo(caminho)
+    return digital
+
+
+def _metadados_validos(caminho):
+    """Retorna os metadados do cache se ele ainda corresponder à planilha, senão ``None``.
+
+    Caminho, tamanho e mtime são conferidos primeiro (só um ``stat``); o hash
+    do conteúdo só é calculado quando eles batem.
+    """
+    try:
+        with open(caminho_cache(caminho, '.json'), encoding='utf-8') as arquivo:
+            metadados = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+    atual = impressao_digital(caminho, com_hash=False)
+    if any(metadados.get(chave) != valor for chave, valor in atual.items()):
+        return None
+    if not os.path.exists(caminho_cache(caminho, metadados.get('extensao', ''))):
+        return None
+    if metadados.get('sha256') != hash_arquivo(caminho):
+        return None
+    return metadados
+
+
+def _ler_snapshot(arquivo, extensao):
+    """Lê o snapshot salvo (Parquet com memory map ou pickle)."""
+    if extensao == '.parquet':
+        return pd.read_parquet(arquivo, memory_map=True)
+    return pd.read_pickle(arquivo)
+
+
+def _gravar_snapshot(df, caminho):
+    """Grava o snapshot de forma atômica e devolve a extensão usada.
+
+    Colunas com tipos misturados não viram Parquet; nesse caso (ou sem
+    ``pyarrow``) o pickle é usado.
+    """
+    temporario = caminho_cache(caminho, '.tmp')
+    extensao = '.pkl'
+    if pyarrow is not None:
+        try:
+            df.to_parquet(temporario, index=False)
+            extensao = '.parquet'
+        except Exception:
+            pass
+    if extensao == '.pkl':
+        df.to_pickle(temporario)
+    os.replace(temporario, caminho_cache(caminho, extensao))
+    return extensao
+
+
+def preparar_dataframe(df):
+    """Limpa, converte os valores e numera os grupos (``_GRUPO``) da planilha.
+
+    Cada ``TITULAR`` abre um grupo com os dependentes que vêm logo abaixo;
+    o agrupamento fica numa coluna em vez de listas de linhas.
+    """
+    df = converter_valores(limpar_dataframe(df))
+    titulares = df['DEPENDENCIA'].astype(str).str.strip().str.upper() == 'TITULAR'
+    df[COLUNA_GRUPO] = titulares.cumsum().to_numpy()
+    # linhas antes do primeiro titular não pertencem a nenhum grupo
+    return df[df[COLUNA_GRUPO] > 0].reset_index(drop=True)
+
+
+def carregar_dataframe(caminho):
+    """Retorna ``(df, do_cache)`` com a planilha preparada, usando o cache se válido."""
+    metadados = _metadados_validos(caminho)
+    if metadados:
+        try:
+            return _ler_snapshot(caminho_cache(caminho, metadados['extensao']), metadados['extensao']), True
+        except Exception as e:
+            print(f"⚠️ Cache de {caminho} ilegível ({e}); relendo a planilha")
+
+    digital = impressao_digital(caminho)
+    df = preparar_dataframe(ler_planilha(caminho))
+    invalidar(caminho)
+    try:
+        digital['extensao'] = _gravar_snapshot(df, caminho)
+        with open(caminho_cache(caminho, '.json'), 'w', encoding='utf-8') as arquivo:
+            json.dump(digital, arquivo, indent=2)
+    except OSError as e:
+        print(f"⚠️ Não foi possível gravar o cache de {caminho}: {e}")
+    return df, False
+
+
+def grupos_do_dataframe(df):
+    """Monta a lista de grupos (titular seguido dos dependentes) a partir de ``_GRUPO``.
+
+    Cada linha é um dicionário coluna -> valor, o mesmo formato que os workers
+    recebem do coordenador, sem o custo de ``iterrows``.
+    """
+    if df.empty:
+        return []
+    colunas = [coluna for coluna in df.columns if coluna != COLUNA_GRUPO]
+    # zip de listas por coluna é bem mais rápido que ``to_dict('records')``
+    linhas = [dict(zip(colunas, valores)) for valores in zip(*(df[coluna].tolist() for coluna in colunas))]
+    inicios = np.flatnonzero(np.diff(df[COLUNA_GRUPO].to_numpy())) + 1
+    limites = [0, *inicios.tolist(), len(linhas)]
+    return [linhas[inicio:fim] for inicio, fim in zip(limites, limites[1:])]
+
+
+def carregar_grupos(caminho):
+    """Lê, limpa e agrupa por titular a planilha indicada, usando o cache se válido."""
+    df, do_cache = carregar_dataframe(caminho)
+    if do_cache:
+        print(f"⚡ Planilha {caminho} carregada do cache")
+    return grupos_do_dataframe(df)
+
+
+def invalidar(caminho):
+    """Apaga os arquivos de cache de uma planilha; retorna os caminhos removidos."""
+    removidos = []
+    for extensao in EXTENSOES_CACHE:
+        arquivo = caminho_cache(caminho, extensao)
+        if os.path.exists(arquivo):
+            os.remove(arquivo)
+            removidos.append(arquivo)
+    return removidos
+
+
+def invalidar_todos(diretorio='.'):
+    """Apaga os caches de todas as planilhas de ``diretorio``; retorna os removidos."""
+    removidos = []
+    for metadados in glob.glob(os.path.join(glob.escape(diretorio), f'*{SUFIXO_CACHE}.json')):
+        removidos += invalidar(metadados[:-len(f'{SUFIXO_CACHE}.json')])
+    return removidos
@@ -0,0 +1,80 @@
+"""Envio incremental: identifica os grupos que mudaram desde o último envio.
+
+Depois de cada envio bem-sucedido, o hash do conteúdo do grupo
+(``entrada.hash_grupo``) é gravado em ``grupos_enviados``, indexado pelo CPF
+do titular. Na planilha seguinte, só os grupos novos ou com hash diferente
+voltam para o navegador.
+"""
+
+import sqlite3
+
+from entrada import hash_grupo, normalizar_cpf
+from particoes import DB_PATH
+
+
+def init_tabela(cursor):
+    """Cria a tabela com o último hash enviado de cada titular."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS grupos_enviados (
+            cpf_titular TEXT PRIMARY KEY,
+            hash TEXT NOT NULL,
+            enviado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def conectar():
+    """Abre o banco principal garantindo que a tabela exista."""
+    conn = sqlite3.connect(DB_PATH)
+    init_tabela(conn.cursor())
+    return conn
+
+
+def carregar_hashes(conn):
+    """Retorna ``{cpf_titular: hash}`` de todos os grupos já enviados."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT cpf_titular, hash FROM grupos_enviados')
+    return dict(cursor.fetchall())
+
+
+def registrar_envios(conn, envios):
+    """Grava ``[(cpf_titular, hash)]`` dos grupos enviados com sucesso."""
+    conn.executemany('''
+        INSERT INTO grupos_enviados (cpf_titular, hash) VALUES (?, ?)
+        ON CONFLICT(cpf_titular) DO UPDATE SET hash = excluded.hash, enviado_em = CURRENT_TIMESTAMP
+    ''', [(normalizar_cpf(cpf), hash_) for cpf, hash_ in envios])
+    conn.commit()
+
+
+def limpar(conn):
+    """Esquece todos os envios, fazendo a próxima planilha ser enviada por completo."""
+    conn.execute('DELETE FROM grupos_enviados')
+    conn.commit()
+
+
+def comparar(grupos, hashes):
+    """Compara os grupos com os hashes enviados.
+
+    Retorna ``(hashes_dos_grupos, indices_a_enviar, resumo)``, onde o resumo
+    conta grupos ``novos``, ``alterados`` e ``sem_alteracao``.
+    """
+    hashes_grupos = [hash_grupo(grupo) for grupo in grupos]
+    indices = []
+    resumo = {'novos': 0, 'alterados': 0, 'sem_alteracao': 0}
+    for indice, (grupo, hash_) in enumerate(zip(grupos, hashes_grupos)):
+        anterior = hashes.get(normalizar_cpf(grupo[0]['CPF']))
+        if anterior is None:
+            resumo['novos'] += 1
+        elif anterior != hash_:
+            resumo['alterados'] += 1
+        else:
+            resumo['sem_alteracao'] += 1
+            continue
+        indices.append(indice)
+    return hashes_grupos, indices, resumo
+
+
+def formatar_resumo(resumo):
+    """Linha de resumo do comparativo para exibir no terminal."""
+    return (f"🔍 Delta: {resumo['novos']} novo(s), {resumo['alterados']} alterado(s), "
+            f"{resumo['sem_alteracao']} sem alteração (ignorados)")
@@ -0,0 +1,112 @@
+"""Leitura e preparação da planilha de entrada (titulares e dependentes).
+
+Compartilhado entre a automação (``test.py``) e o coordenador de lotes do
+``app.py``, que precisa agrupar a entrada sem depender do Selenium.
+"""
+
+import hashlib
+import json
+import re
+
+import pandas as pd
+
+from valores import serie_para_centavos, para_centavos, formatar_centavos
+
+COLUNAS_VALOR = ['TOTAL', 'VALOR', 'VALOR TOTAL', 'VALOR_TOTAL']
+COLUNA_CENTAVOS = 'VALOR_CENTAVOS'
+COLUNAS_GRUPO = ['NOME', 'CPF', 'DEPENDENCIA', COLUNA_CENTAVOS]
+
+def ler_planilha(caminho):
+    """Lê a planilha de entrada em CSV (separado por ``;``) ou XLSX."""
+    if str(caminho).lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(caminho)
+    return pd.read_csv(caminho, sep=';')
+
+def limpar_dataframe(df):
+    """Limpa o dataframe removendo linhas com valores nulos"""
+    df_limpo = df.dropna(subset=['NOME', 'CPF', 'DEPENDENCIA'])
+    df_limpo = df_limpo[
+        (df_limpo['NOME'].astype(str).str.strip() != '') &
+        (df_limpo['CPF'].astype(str).str.strip() != '') &
+        (df_limpo['DEPENDENCIA'].astype(str).str.strip() != '')
+    ]
+    return df_limpo
+
+def converter_valores(df):
+    """Converte uma única vez as colunas de valor para centavos inteiros.
+
+    Usa a primeira coluna de ``COLUNAS_VALOR`` preenchida em cada linha, como
+    ``obter_valor`` fazia linha a linha.
+    """
+    centavos = pd.Series(pd.NA, index=df.index, dtype='Int64')
+    for coluna in COLUNAS_VALOR:
+        if coluna in df.columns:
+            centavos = centavos.fillna(serie_para_centavos(df[coluna]))
+    df = df.copy()
+    df[COLUNA_CENTAVOS] = centavos.fillna(0).astype('int64')
+    return df
+
+def obter_centavos(row):
+    """Retorna o valor monetário da linha em centavos inteiros."""
+    if COLUNA_CENTAVOS in row:
+        return int(row[COLUNA_CENTAVOS])
+    for coluna in COLUNAS_VALOR:
+        if coluna in row and pd.notna(row[coluna]):
+            return para_centavos(row[coluna])
+    return 0
+
+def obter_valor(row):
+    """Retorna o valor monetário da linha, já formatado no padrão brasileiro."""
+    return formatar_centavos(obter_centavos(row))
+
+def normalizar_cpf(cpf):
+    """Mantém apenas os dígitos do CPF (``541.820.379-79`` -> ``54182037979``)."""
+    return re.sub(r'\D', '', str(cpf))
+
+def _normalizar_cpf_sql(cpf):
+    """``normalizar_cpf`` para o SQLite: ``NULL`` continua ``NULL`` e CPFs já limpos passam direto."""
+    if cpf is None:
+        return None
+    cpf = str(cpf)
+    return cpf if cpf.isdecimal() else normalizar_cpf(cpf)
+
+def registrar_normalizar_cpf(conn):
+    """Registra ``normalizar_cpf`` como função SQL da conexão (usada por ``cpf_normalizado_sql``)."""
+    conn.create_function('normalizar_cpf', 1, _normalizar_cpf_sql, deterministic=True)
+
+def cpf_normalizado_sql(expressao):
+    """Expressão SQL com o CPF de ``expressao`` só com dígitos, como ``normalizar_cpf``.
+
+    A conexão precisa ter passado por ``registrar_normalizar_cpf``.
+    """
+    return f"normalizar_cpf({expressao})"
+
+def hash_grupo(grupo):
+    """Hash estável do conteúdo enviado de um grupo (titular, dependentes e valores).
+
+    Não depende da ordem dos dependentes, da formatação do CPF nem do nome,
+    para que a mesma família em planilhas de meses diferentes gere o mesmo hash.
+    """
+    titular = grupo[0]
+    dependentes = sorted(
+        (normalizar_cpf(dep['CPF']), str(dep['DEPENDENCIA']).strip().upper(), obter_centavos(dep))
+        for dep in grupo[1:]
+        if dep['CPF'] is not None and pd.notna(dep['CPF'])
+    )
+    conteudo = [normalizar_cpf(titular['CPF']), obter_centavos(titular), dependentes]
+    return hashlib.sha256(json.dumps(conteudo, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def grupo_para_registros(grupo):
+    """Converte um grupo em lista de dicionários serializáveis em JSON."""
+    registros = []
+    for row in grupo:
+        registro = {}
+        for coluna in COLUNAS_GRUPO:
+            valor = row[coluna] if coluna in row else None
+            if valor is not None and pd.isna(valor):
+                valor = None
+            elif hasattr(valor, 'item'):
+                valor = valor.item()
+            registro[coluna] = valor
+        registros.append(registro)
+    return registros
@@ -1,21 +1,82 @@
 """
 Script auxiliar para gerenciar o banco de dados EFD-REINF
 Útil para visualizar, limpar ou exportar declarações
+
+Sem argumentos abre o menu interativo; com um subcomando roda sem prompts
+(ex.: ``python gerenciar_db.py deletar --intervalo 100 200 --dry-run``).
 """
 
+import argparse
 import sqlite3
 import csv
 import json
 import os
-from datetime import datetime
+import sys
+import time
+from datetime import date, datetime, timezone
+
+import cache_entrada
+import delta
+import particoes
+import reconciliacao
+from app import init_db
+from entrada import cpf_normalizado_sql, normalizar_cpf, registrar_normalizar_cpf
+from particoes import chave_filtro
+from valores import formatar_centavos
+
+# CPF só com dígitos, como ``entrada.normalizar_cpf`` e a chave de ``grupos_enviados``
+CPF_NORMALIZADO_SQL = cpf_normalizado_sql('cpf')
 
 def conectar():
-    """Conecta ao banco de dados"""
-    return sqlite3.connect('cadastros.db')
+    """Conecta ao banco principal (catálogo de partições e índice de ids)"""
+    conn = sqlite3.connect(particoes.DB_PATH)
+    registrar_normalizar_cpf(conn)
+    return conn
+
+
+class Progresso:
+    """Mostra o andamento de uma operação longa no máximo a cada ``intervalo`` segundos"""
+    
+    def __init__(self, total, descricao, intervalo=1.0):
+        """Define o total esperado, o texto exibido e o intervalo mínimo entre mensagens"""
+        self.total = total
+        self.descricao = descricao
+        self.intervalo = intervalo
+        self._ultimo = 0.0
+        self._ultimo_valor = None
+    
+    def atualizar(self, feitos, forcar=False):
+        """Imprime o progresso se o intervalo já passou (ou se ``forcar``)"""
+        agora = time.monotonic()
+        if feitos == self._ultimo_valor or (not forcar and agora - self._ultimo < self.intervalo):
+            return
+        self._ultimo = agora
+        self._ultimo_valor = feitos
+        percentual = feitos * 100 / self.total if self.total else 100
+        print(f"⏳ {self.descricao}: {feitos}/{self.total} ({percentual:.0f}%)")
+
+
+def resumir_ids(ids, limite=20):
+    """Texto curto com os primeiros ids de uma lista longa"""
+    if len(ids) <= limite:
+        return str(ids)
+    return f"[{', '.join(map(str, ids[:limite]))}, ...] ({len(ids)} no total)"
+
+
+def confirmar(pergunta, confirmado):
+    """Pergunta ao usuário, a menos que a operação já venha confirmada (``--sim``)"""
+    if confirmado:
+        return True
+    return input(pergunta).lower() == 'sim'
 
 
 def limpar_checkpoint():
-    """Remove o arquivo de checkpoint para reiniciar o processamento."""
+    """Remove o checkpoint (e os grupos resolvidos além dele) para reiniciar o processamento."""
+    if os.path.exists('checkpoint_resolvidos.txt'):
+        try:
+            os.remove('checkpoint_resolvidos.txt')
+        except OSError as exc:
+            print(f"⚠️ Não foi possível remover checkpoint_resolvidos.txt: {exc}")
     if os.path.exists('checkpoint.txt'):
         try:
             os.remove('checkpoint.txt')
@@ -24,67 +85,69 @@ def limpar_checkpoint():
             print(f"⚠️ Não foi possível remover o checkpoint: {exc}")
 
 
-def estatisticas():
+def estatisticas(competencia=None):
     """Mostra estatísticas das declarações EFD-REINF"""
+    chaves = [chave_filtro(competencia)] if competencia else None
     conn = conectar()
-    cursor = conn.cursor()
     
-    # Total de declarações
-    cursor.execute('SELECT COUNT(*) FROM efd_declaracoes')
-    total = cursor.fetchone()[0]
-    
-    # Total de dependentes
-    cursor.execute('SELECT dependentes FROM efd_declaracoes WHERE dependentes IS NOT NULL AND dependentes != "[]"')
-    dependentes_data = cursor.fetchall()
+    total = 0
     total_dependentes = 0
-    for dep_data in dependentes_data:
-        if dep_data[0]:
-            dependentes = json.loads(dep_data[0])
-            total_dependentes += len(dependentes)
-    
-    # Total de planos de saúde
-    cursor.execute('SELECT planos_saude FROM efd_declaracoes WHERE planos_saude IS NOT NULL AND planos_saude != "[]"')
-    planos_data = cursor.fetchall()
     total_planos = 0
-    for plano_data in planos_data:
-        if plano_data[0]:
-            planos = json.loads(plano_data[0])
-            total_planos += len(planos)
-    
-    # Total de informações de dependentes
-    cursor.execute('SELECT dependentes_planos FROM efd_declaracoes WHERE dependentes_planos IS NOT NULL AND dependentes_planos != "[]"')
-    dep_planos_data = cursor.fetchall()
     total_dep_planos = 0
-    for dp_data in dep_planos_data:
-        if dp_data[0]:
-            dep_planos = json.loads(dp_data[0])
-            total_dep_planos += len(dep_planos)
+    total_titular_centavos = 0
+    total_dependentes_centavos = 0
+    
+    # Cada partição é agregada isoladamente; os totais são somados em centavos inteiros
+    for linha in particoes.consultar(conn, '''
+        SELECT COUNT(*),
+               COALESCE(SUM(valor_titular_centavos), 0),
+               COALESCE(SUM(valor_dependentes_centavos), 0)
+        FROM efd_declaracoes
+    ''', chaves=chaves):
+        total += linha[0]
+        total_titular_centavos += linha[1]
+        total_dependentes_centavos += linha[2]
+    
+    for dependentes, planos, dep_planos in particoes.consultar(
+        conn, 'SELECT dependentes, planos_saude, dependentes_planos FROM efd_declaracoes', chaves=chaves
+    ):
+        if dependentes and dependentes != '[]':
+            total_dependentes += len(json.loads(dependentes))
+        if planos and planos != '[]':
+            total_planos += len(json.loads(planos))
+        if dep_planos and dep_planos != '[]':
+            total_dep_planos += len(json.loads(dep_planos))
     
     conn.close()
     
     print("\n" + "="*80)
-    print("📊 ESTATÍSTICAS EFD-REINF")
+    print("📊 ESTATÍSTICAS EFD-REINF" + (f" - Competência {competencia}" if competencia else ""))
     print("="*80)
     
     print(f"\n📈 Total de declarações: {total}")
     print(f"👥 Total de dependentes: {total_dependentes}")
     print(f"🏥 Total de planos de saúde: {total_planos}")
     print(f"💰 Total de informações de dependentes: {total_dep_planos}")
+    print(f"\n💵 Valor total dos titulares: R$ {formatar_centavos(total_titular_centavos)}")
+    print(f"💵 Valor total dos dependentes: R$ {formatar_centavos(total_dependentes_centavos)}")
+    print(f"💵 Valor total geral: R$ {formatar_centavos(total_titular_centavos + total_dependentes_centavos)}")
     
     if total > 0:
         print(f"\n📊 Médias por declaração:")
         print(f"  • Dependentes: {total_dependentes/total:.1f}")
         print(f"  • Planos de saúde: {total_planos/total:.1f}")
         print(f"  • Informações de dependentes: {total_dep_planos/total:.1f}")
+        media_centavos = (total_titular_centavos + total_dependentes_centavos) // total
+        print(f"  • Valor: R$ {formatar_centavos(media_centavos)}")
     
     print("\n" + "="*80 + "\n")
 
 def buscar_por_cpf(cpf):
     """Busca declarações por CPF"""
     conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM efd_declaracoes WHERE cpf LIKE ?', (f'%{cpf}%',))
-    resultados = cursor.fetchall()
+    resultados = list(particoes.consultar_ordenado(
+        conn, 'SELECT * FROM efd_declaracoes WHERE cpf LIKE ? ORDER BY id', (f'%{cpf}%',)
+    ))
     conn.close()
     
     if not resultados:
@@ -95,16 +158,18 @@ def buscar_por_cpf(cpf):
     for dec in resultados:
         print(f"🆔 #{dec[0]} - CPF: {dec[3]} - CNPJ: {dec[2]} - Data: {dec[1]}")
 
-def limpar_banco():
+def contar_declaracoes(cursor):
+    """Total de declarações em todas as partições (pelo índice global de ids)."""
+    cursor.execute('SELECT COUNT(*) FROM efd_indice')
+    return cursor.fetchone()[0]
+
+def limpar_banco(confirmado=False):
     """Limpa todos os registros do banco"""
-    resposta = input("⚠️  ATENÇÃO: Isso irá APAGAR TODAS as declarações EFD-REINF. Confirma? (sim/não): ")
-    
-    if resposta.lower() == 'sim':
+    if confirmar("⚠️  ATENÇÃO: Isso irá APAGAR TODAS as declarações EFD-REINF. Confirma? (sim/não): ", confirmado):
         conn = conectar()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM efd_declaracoes')
-        linhas_afetadas = cursor.rowcount
-        conn.commit()
+        linhas_afetadas = contar_declaracoes(conn.cursor())
+        particoes.remover_todas(conn)
+        delta.limpar(conn)
         conn.close()
         print(f"\n✅ {linhas_afetadas} declaração(ões) removida(s)\n")
         limpar_checkpoint()
@@ -114,12 +179,13 @@ def limpar_banco():
 def exportar_csv():
     """Exporta declarações EFD-REINF para CSV"""
     conn = conectar()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM efd_declaracoes')
-    declaracoes = cursor.fetchall()
-    conn.close()
+    declaracoes = particoes.consultar_ordenado(
+        conn, f'SELECT {", ".join(particoes.COLUNAS_DECLARACAO)} FROM efd_declaracoes ORDER BY id'
+    )
+    primeira = next(declaracoes, None)
     
-    if not declaracoes:
+    if primeira is None:
+        conn.close()
         print("\n❌ Nenhuma declaração para exportar\n")
         return
     
@@ -131,35 +197,51 @@ def exportar_csv():
         # Cabeçalho
         writer.writerow([
             'ID', 'Data', 'CNPJ', 'CPF', 'Dependentes', 
-            'Planos_Saude', 'Dependentes_Planos', 'Data_Cadastro'
+            'Planos_Saude', 'Dependentes_Planos', 'Data_Cadastro',
+            'Valor_Titular_Centavos', 'Valor_Dependentes_Centavos'
         ])
         
-        # Dados
+        # Dados (lidos das partições em streaming)
+        writer.writerow(primeira)
         writer.writerows(declaracoes)
     
+    conn.close()
     print(f"\n✅ Dados exportados para: {nome_arquivo}\n")
 
-def deletar_por_id(id_declaracao):
+def deletar_por_id(id_declaracao, confirmado=False):
     """Deleta uma declaração específica"""
     conn = conectar()
     cursor = conn.cursor()
     
-    # Verificar se existe
-    cursor.execute('SELECT cpf, cnpj FROM efd_declaracoes WHERE id = ?', (id_declaracao,))
-    resultado = cursor.fetchone()
+    # Verificar se existe e em qual partição está
+    local = particoes.localizar(conn, id_declaracao)
+    resultado = None
+    if local:
+        particao = particoes.abrir_particao(*local)
+        resultado = particao.execute('SELECT cpf, cnpj FROM efd_declaracoes WHERE id = ?', (id_declaracao,)).fetchone()
+        particao.close()
     
     if not resultado:
         print(f"\n❌ Declaração #{id_declaracao} não encontrada\n")
         conn.close()
         return
     
+    chave, arquivada = local
+    if arquivada:
+        print(f"\n❌ Declaração #{id_declaracao} pertence à competência arquivada {chave} (somente leitura)\n")
+        conn.close()
+        return
+    
     cpf = resultado[0]
     cnpj = resultado[1]
-    resposta = input(f"⚠️  Deseja deletar a declaração #{id_declaracao} (CPF: {cpf}, CNPJ: {cnpj})? (sim/não): ")
-    
-    if resposta.lower() == 'sim':
-        cursor.execute('DELETE FROM efd_declaracoes WHERE id = ?', (id_declaracao,))
+    if confirmar(f"⚠️  Deseja deletar a declaração #{id_declaracao} (CPF: {cpf}, CNPJ: {cnpj})? (sim/não): ", confirmado):
+        cursor.execute('ATTACH DATABASE ? AS particao', (particoes.caminho_particao(chave),))
+        cursor.execute('DELETE FROM particao.efd_declaracoes WHERE id = ?', (id_declaracao,))
+        cursor.execute('DELETE FROM efd_indice WHERE id = ?', (id_declaracao,))
+        # O titular volta a ser enviado na próxima planilha (envio incremental)
+        cursor.execute('DELETE FROM grupos_enviados WHERE cpf_titular = ?', (normalizar_cpf(cpf),))
         conn.commit()
+        cursor.execute('DETACH DATABASE particao')
         print(f"\n✅ Declaração #{id_declaracao} deletada com sucesso\n")
     else:
         print("\n❌ Operação cancelada\n")
@@ -174,20 +256,19 @@ def mostrar_status_ids():
     cursor = conn.cursor()
     
     try:
-        cursor.execute('SELECT COUNT(*) FROM efd_declaracoes')
-        total = cursor.fetchone()[0]
+        total = contar_declaracoes(cursor)
         
         if total == 0:
             print("📭 Nenhuma declaração encontrada.")
         else:
-            cursor.execute('SELECT MIN(id), MAX(id) FROM efd_declaracoes')
+            cursor.execute('SELECT MIN(id), MAX(id) FROM efd_indice')
             min_id, max_id = cursor.fetchone()
             print(f"📈 Total de declarações: {total}")
             print(f"🆔 ID mínimo: {min_id}")
             print(f"🆔 ID máximo: {max_id}")
             
             # Verificar se há gaps
-            cursor.execute('SELECT id FROM efd_declaracoes ORDER BY id')
+            cursor.execute('SELECT id FROM efd_indice ORDER BY id')
             ids = [row[0] for row in cursor.fetchall()]
             ids_esperados = list(range(1, total + 1))
             
@@ -195,16 +276,16 @@ def mostrar_status_ids():
                 print("✅ IDs estão sequenciais (1, 2, 3, ...)")
             else:
                 print("⚠️ IDs não estão sequenciais")
-                print(f"   IDs atuais: {ids}")
-                print(f"   IDs esperados: {ids_esperados}")
+                print(f"   IDs atuais: {resumir_ids(ids)}")
+                print(f"   IDs esperados: {resumir_ids(ids_esperados)}")
     
     except Exception as e:
         print(f"❌ Erro ao verificar status: {str(e)}")
     finally:
         conn.close()
 
-def resetar_ids():
-    """Reseta os IDs da tabela efd_declaracoes"""
+def resetar_ids(confirmado=False):
+    """Reseta os IDs das declarações em todas as partições"""
     print("🔄 Resetando IDs do banco de dados...")
     
     conn = conectar()
@@ -212,58 +293,69 @@ def resetar_ids():
     
     try:
         # Verificar se há dados
-        cursor.execute('SELECT COUNT(*) FROM efd_declaracoes')
-        total = cursor.fetchone()[0]
+        total = contar_declaracoes(cursor)
         
         if total == 0:
             print("📭 Nenhuma declaração encontrada para resetar.")
             conn.close()
             return
         
+        arquivadas = [chave for chave, arquivada in particoes.listar_particoes(conn) if arquivada]
+        if arquivadas:
+            print(f"❌ Há competências arquivadas (somente leitura): {', '.join(arquivadas)}")
+            print("   O reset de IDs só é possível sem partições arquivadas.")
+            conn.close()
+            return
+        
         print(f"📊 Total de declarações: {total}")
         
         # Mostrar IDs atuais
-        cursor.execute('SELECT id FROM efd_declaracoes ORDER BY id')
+        cursor.execute('SELECT id FROM efd_indice ORDER BY id')
         ids_atuais = [row[0] for row in cursor.fetchall()]
-        print(f"🆔 IDs atuais: {ids_atuais}")
+        print(f"🆔 IDs atuais: {resumir_ids(ids_atuais)}")
         
         # Confirmar operação
-        resposta = input(f"\n⚠️  Deseja resetar os IDs de {total} declarações? (sim/não): ")
-        
-        if resposta.lower() != 'sim':
+        if not confirmar(f"\n⚠️  Deseja resetar os IDs de {total} declarações? (sim/não): ", confirmado):
             print("❌ Operação cancelada.")
             conn.close()
             return
         
-        # Criar tabela temporária com dados
-        cursor.execute('''
-            CREATE TABLE efd_declaracoes_temp AS 
-            SELECT * FROM efd_declaracoes ORDER BY data_cadastro
-        ''')
-        
-        # Limpar tabela original
-        cursor.execute('DELETE FROM efd_declaracoes')
-        
-        # Resetar sequência do ID
-        cursor.execute('DELETE FROM sqlite_sequence WHERE name="efd_declaracoes"')
+        # Novos IDs seguem a ordem de cadastro, considerando todas as partições
+        cadastros = []
+        for chave, _ in particoes.listar_particoes(conn):
+            for declaracao_id, data_cadastro in particoes.consultar(
+                conn, 'SELECT id, data_cadastro FROM efd_declaracoes', chaves=[chave]
+            ):
+                cadastros.append((data_cadastro or '', declaracao_id, chave))
+        cadastros.sort()
+        novos_ids = {(chave, antigo): novo for novo, (_, antigo, chave) in enumerate(cadastros, start=1)}
         
-        # Inserir dados com novos IDs sequenciais
-        cursor.execute('''
-            INSERT INTO efd_declaracoes (data, cnpj, cpf, dependentes, planos_saude, dependentes_planos, data_cadastro)
-            SELECT data, cnpj, cpf, dependentes, planos_saude, dependentes_planos, data_cadastro
-            FROM efd_declaracoes_temp
-        ''')
+        for chave, _ in particoes.listar_particoes(conn):
+            cursor.execute('ATTACH DATABASE ? AS particao', (particoes.caminho_particao(chave),))
+            # Duas etapas (negativo e depois positivo) evitam colisão de chave primária
+            cursor.executemany(
+                'UPDATE particao.efd_declaracoes SET id = ? WHERE id = ?',
+                [(-novo, antigo) for (c, antigo), novo in novos_ids.items() if c == chave]
+            )
+            cursor.execute('UPDATE particao.efd_declaracoes SET id = -id WHERE id < 0')
+            conn.commit()
+            cursor.execute('DETACH DATABASE particao')
         
-        # Remover tabela temporária
-        cursor.execute('DROP TABLE efd_declaracoes_temp')
+        # Reconstruir o índice global com a sequência reiniciada
+        cursor.execute('DELETE FROM efd_indice')
+        cursor.execute('DELETE FROM sqlite_sequence WHERE name="efd_indice"')
+        cursor.executemany(
+            'INSERT INTO efd_indice (id, competencia) VALUES (?, ?)',
+            [(novo, chave) for (chave, _), novo in sorted(novos_ids.items(), key=lambda item: item[1])]
+        )
         
         # Confirmar alterações
         conn.commit()
         
         # Verificar resultado
-        cursor.execute('SELECT id FROM efd_declaracoes ORDER BY id')
+        cursor.execute('SELECT id FROM efd_indice ORDER BY id')
         ids_novos = [row[0] for row in cursor.fetchall()]
-        print(f"✅ IDs resetados: {ids_novos}")
+        print(f"✅ IDs resetados: {resumir_ids(ids_novos)}")
         
         print(f"\n🎉 Reset concluído! {total} declarações com IDs sequenciais de 1 a {total}")
         
@@ -273,7 +365,7 @@ def resetar_ids():
     finally:
         conn.close()
 
-def reset_completo():
+def reset_completo(confirmado=False):
     """Reseta completamente o banco (remove todos os dados)"""
     print("🗑️ Reset completo do banco de dados...")
     
@@ -282,8 +374,7 @@ def reset_completo():
     
     try:
         # Verificar dados
-        cursor.execute('SELECT COUNT(*) FROM efd_declaracoes')
-        total = cursor.fetchone()[0]
+        total = contar_declaracoes(cursor)
         
         if total == 0:
             print("📭 Banco já está vazio.")
@@ -293,18 +384,14 @@ def reset_completo():
         print(f"📊 Total de declarações: {total}")
         
         # Confirmar operação
-        resposta = input(f"\n⚠️  ATENÇÃO: Isso irá APAGAR TODAS as {total} declarações! Confirma? (sim/não): ")
-        
-        if resposta.lower() != 'sim':
+        if not confirmar(f"\n⚠️  ATENÇÃO: Isso irá APAGAR TODAS as {total} declarações! Confirma? (sim/não): ", confirmado):
             print("❌ Operação cancelada.")
             conn.close()
             return
         
-        # Limpar tabela
-        cursor.execute('DELETE FROM efd_declaracoes')
-        cursor.execute('DELETE FROM sqlite_sequence WHERE name="efd_declaracoes"')
-        
-        conn.commit()
+        # Remover partições, catálogo e índice de ids (sequência reiniciada)
+        particoes.remover_todas(conn)
+        delta.limpar(conn)
         print(f"✅ {total} declarações removidas. Banco resetado!")
         limpar_checkpoint()
         
@@ -314,6 +401,249 @@ def reset_completo():
     finally:
         conn.close()
 
+def listar_competencias():
+    """Lista as partições por competência com quantidade de declarações e tamanho"""
+    conn = conectar()
+    cursor = conn.cursor()
+    cursor.execute('SELECT competencia, COUNT(*) FROM efd_indice GROUP BY competencia')
+    quantidades = dict(cursor.fetchall())
+    lista = particoes.listar_particoes(conn)
+    conn.close()
+    
+    if not lista:
+        print("\n📭 Nenhuma competência cadastrada.\n")
+        return
+    
+    print("\n📅 Competências:")
+    for chave, arquivada in lista:
+        caminho = particoes.caminho_particao(chave)
+        tamanho = os.path.getsize(caminho) / 1024 if os.path.exists(caminho) else 0
+        situacao = "🔒 arquivada" if arquivada else "✏️  aberta"
+        print(f"  • {chave}: {quantidades.get(chave, 0)} declaração(ões), {tamanho:.1f} KB - {situacao}")
+    print()
+
+def arquivar_competencia(competencia):
+    """Compacta (VACUUM) a partição de uma competência fechada e a torna somente leitura"""
+    chave = chave_filtro(competencia)
+    conn = conectar()
+    try:
+        caminho = particoes.caminho_particao(chave)
+        antes = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+        if particoes.arquivar(conn, chave):
+            depois = os.path.getsize(caminho)
+            print(f"\n🔒 Competência {chave} arquivada ({antes / 1024:.1f} KB → {depois / 1024:.1f} KB)\n")
+        else:
+            print(f"\nℹ️ Competência {chave} já estava arquivada\n")
+    except KeyError:
+        print(f"\n❌ Competência '{competencia}' não encontrada\n")
+    finally:
+        conn.close()
+
+def ler_cpfs(caminho):
+    """Lê um arquivo com um CPF por linha (formatado ou não), ignorando linhas sem dígitos"""
+    cpfs = set()
+    with open(caminho, encoding='utf-8-sig') as arquivo:
+        for linha in arquivo:
+            cpf = normalizar_cpf(linha.split(';')[0])
+            if cpf:
+                cpfs.add(cpf)
+    return cpfs
+
+def ler_data_cadastro(valor):
+    """Interpreta ``--desde``/``--ate`` (``AAAA-MM-DD [HH:MM:SS]``) no formato de ``data_cadastro``.
+
+    Retorna ``(texto, dia_inteiro)``: ``texto`` é comparável com as datas
+    gravadas pelo SQLite (``AAAA-MM-DD HH:MM:SS``, em UTC) e ``dia_inteiro``
+    indica que só a data foi informada. Levanta ``ValueError`` para qualquer
+    outro formato (ex.: ``19/10/2025``).
+    """
+    texto = valor.strip()
+    try:
+        return date.fromisoformat(texto).strftime('%Y-%m-%d'), True
+    except ValueError:
+        pass
+    try:
+        momento = datetime.fromisoformat(texto)
+    except ValueError:
+        raise ValueError(f"Data inválida: '{valor}' (use AAAA-MM-DD [HH:MM:SS])") from None
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(timezone.utc).replace(tzinfo=None)
+    return momento.strftime('%Y-%m-%d %H:%M:%S'), False
+
+def deletar_em_lote(ids=None, intervalo=None, arquivo_cpfs=None, competencia=None,
+                    desde=None, ate=None, dry_run=False, confirmado=False):
+    """Deleta de uma vez todas as declarações que atendem aos filtros (combinados com E)
+    
+    Cada partição afetada é anexada e limpa com DELETEs baseados em conjunto
+    (partição, índice global de ids e hashes de ``grupos_enviados`` dos
+    titulares removidos) dentro de uma única transação.
+    Competências arquivadas são somente leitura e ficam de fora.
+    """
+    if not (ids or intervalo or arquivo_cpfs or competencia or desde or ate):
+        print("\n❌ Informe ao menos um filtro para deletar\n")
+        return 0
+    # Competência inválida cairia em sem_competencia e apagaria declarações sem relação
+    chave_alvo = chave_filtro(competencia) if competencia else None
+    # Datas fora do formato ISO comparariam como texto e pegariam as linhas erradas
+    desde = ler_data_cadastro(desde)[0] if desde else None
+    ate, ate_dia_inteiro = ler_data_cadastro(ate) if ate else (None, False)
+    
+    conn = conectar()
+    cursor = conn.cursor()
+    condicoes = []
+    parametros = []
+    filtro_indice = []
+    parametros_indice = []
+    
+    if ids:
+        cursor.execute('CREATE TEMP TABLE alvo_ids (id INTEGER PRIMARY KEY)')
+        cursor.executemany('INSERT OR IGNORE INTO temp.alvo_ids (id) VALUES (?)', [(i,) for i in ids])
+        condicoes.append('id IN (SELECT id FROM temp.alvo_ids)')
+        filtro_indice.append('id IN (SELECT id FROM temp.alvo_ids)')
+    if intervalo:
+        condicoes.append('id BETWEEN ? AND ?')
+        parametros.extend(intervalo)
+        filtro_indice.append('id BETWEEN ? AND ?')
+        parametros_indice.extend(intervalo)
+    if arquivo_cpfs:
+        cpfs = ler_cpfs(arquivo_cpfs)
+        cursor.execute('CREATE TEMP TABLE alvo_cpfs (cpf TEXT PRIMARY KEY)')
+        cursor.executemany('INSERT INTO temp.alvo_cpfs (cpf) VALUES (?)', [(cpf,) for cpf in cpfs])
+        condicoes.append(f"{CPF_NORMALIZADO_SQL} IN (SELECT cpf FROM temp.alvo_cpfs)")
+    if desde:
+        condicoes.append('data_cadastro >= ?')
+        parametros.append(desde)
+    if ate:
+        # Data sem hora inclui o dia inteiro
+        condicoes.append("data_cadastro < date(?, '+1 day')" if ate_dia_inteiro else 'data_cadastro <= ?')
+        parametros.append(ate)
+    where = ' AND '.join(condicoes) or '1 = 1'
+    # Fecha a transação implícita das tabelas temporárias (ATTACH/DETACH exigem)
+    conn.commit()
+    
+    # Só as partições que podem conter os ids/competência pedidos
+    chaves = None
+    if filtro_indice:
+        cursor.execute(
+            f"SELECT DISTINCT competencia FROM efd_indice WHERE {' AND '.join(filtro_indice)}",
+            parametros_indice
+        )
+        chaves = {linha[0] for linha in cursor.fetchall()}
+    if chave_alvo:
+        chaves = {chave_alvo} if chaves is None else chaves & {chave_alvo}
+    
+    alvo = particoes.listar_particoes(conn, chaves)
+    arquivadas = [chave for chave, arquivada in alvo if arquivada]
+    abertas = [chave for chave, arquivada in alvo if not arquivada]
+    if arquivadas:
+        print(f"🔒 Competências arquivadas ignoradas: {', '.join(arquivadas)}")
+    
+    contagens = {}
+    for chave in abertas:
+        cursor.execute('ATTACH DATABASE ? AS particao', (particoes.caminho_particao(chave),))
+        cursor.execute(f'SELECT COUNT(*) FROM particao.efd_declaracoes WHERE {where}', parametros)
+        contagens[chave] = cursor.fetchone()[0]
+        cursor.execute('DETACH DATABASE particao')
+    total = sum(contagens.values())
+    
+    print(f"\n🔎 {total} declaração(ões) atendem aos filtros em {len([c for c in contagens.values() if c])} competência(s)")
+    if dry_run or total == 0:
+        if dry_run:
+            print("ℹ️ Dry-run: nada foi apagado\n")
+        conn.close()
+        return total
+    
+    if not confirmar(f"⚠️  Deseja deletar {total} declaração(ões)? (sim/não): ", confirmado):
+        print("\n❌ Operação cancelada\n")
+        conn.close()
+        return 0
+    
+    progresso = Progresso(total, "Removendo declarações")
+    removidas = 0
+    for chave in abertas:
+        if not contagens[chave]:
+            continue
+        cursor.execute('ATTACH DATABASE ? AS particao', (particoes.caminho_particao(chave),))
+        try:
+            cursor.execute(
+                f'DELETE FROM main.efd_indice WHERE id IN (SELECT id FROM particao.efd_declaracoes WHERE {where})',
+                parametros
+            )
+            # Sem isso o envio incremental trataria os titulares apagados como já enviados
+            cursor.execute(
+                f'DELETE FROM main.grupos_enviados WHERE cpf_titular IN '
+                f'(SELECT {CPF_NORMALIZADO_SQL} FROM particao.efd_declaracoes WHERE {where})',
+                parametros
+            )
+            cursor.execute(f'DELETE FROM particao.efd_declaracoes WHERE {where}', parametros)
+            removidas += cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute('DETACH DATABASE particao')
+        progresso.atualizar(removidas)
+    progresso.atualizar(removidas, forcar=True)
+    
+    conn.close()
+    print(f"\n✅ {removidas} declaração(ões) removida(s)\n")
+    return removidas
+
+def reconciliar(arquivo, competencia=None, saida=None, limite=10):
+    """Confere se cada grupo da planilha foi gravado com os dependentes e valores certos"""
+    chaves = [chave_filtro(competencia)] if competencia else None
+    inicio = time.monotonic()
+    planilha = reconciliacao.carregar_planilha(arquivo)
+    conn = conectar()
+    try:
+        banco = reconciliacao.tabelas_do_banco(conn, chaves)
+    finally:
+        conn.close()
+    divergencias = reconciliacao.reconciliar(planilha, banco)
+    
+    print(f"\n🔎 Reconciliação: {len(planilha[0])} titular(es) na planilha, "
+          f"{len(banco[0])} declaração(ões) no banco ({time.monotonic() - inicio:.1f}s)")
+    if divergencias.empty:
+        print("✅ Tudo confere: todos os grupos estão no banco com dependentes e valores corretos\n")
+        return divergencias
+    
+    for tipo, descricao in reconciliacao.TIPOS_DIVERGENCIA.items():
+        linhas = divergencias[divergencias['tipo'] == tipo]
+        if linhas.empty:
+            continue
+        print(f"\n⚠️  {descricao}: {len(linhas)}")
+        for linha in linhas.head(limite).itertuples(index=False):
+            detalhes = [f"titular {linha.cpf_titular}"]
+            if linha.cpf_dependente:
+                detalhes.append(f"dependente {linha.cpf_dependente}")
+            if linha.esperado or linha.encontrado:
+                detalhes.append(f"esperado {linha.esperado or '-'} / encontrado {linha.encontrado or '-'}")
+            if linha.ids:
+                detalhes.append(f"{'grupos' if tipo == 'titular_repetido_planilha' else 'ids'} {linha.ids}")
+            print(f"   • {' | '.join(detalhes)}")
+        if len(linhas) > limite:
+            print(f"   ... e mais {len(linhas) - limite}")
+    
+    if saida:
+        divergencias.to_csv(saida, sep=';', index=False, encoding='utf-8-sig')
+        print(f"\n💾 Divergências exportadas para: {saida}")
+    print()
+    return divergencias
+
+def limpar_cache(arquivos=None):
+    """Apaga o cache da planilha de entrada (das indicadas ou de todas no diretório atual)"""
+    if arquivos:
+        removidos = [arquivo for caminho in arquivos for arquivo in cache_entrada.invalidar(caminho)]
+    else:
+        removidos = cache_entrada.invalidar_todos()
+    if not removidos:
+        print("\nℹ️ Nenhum cache de planilha encontrado\n")
+        return
+    for arquivo in removidos:
+        print(f"🧹 Removido: {arquivo}")
+    print("✅ A próxima execução vai reler a planilha\n")
+
 def menu():
     """Menu principal"""
     while True:
@@ -328,39 +658,149 @@ def menu():
         print("6  - Ver status dos IDs")
         print("7  - Resetar IDs (reorganizar)")
         print("8  - Reset completo (apagar tudo)")
+        print("9  - Listar competências")
+        print("10 - Arquivar competência (compactar e tornar somente leitura)")
+        print("11 - Reconciliar planilha com o banco")
+        print("12 - Limpar cache da planilha de entrada")
         print("0  - Sair")
         
         opcao = input("\nEscolha uma opção: ")
         
-        if opcao == "1":
-            cpf = input("Digite o CPF para buscar: ")
-            buscar_por_cpf(cpf)
-        elif opcao == "2":
-            estatisticas()
-        elif opcao == "3":
-            exportar_csv()
-        elif opcao == "4":
-            id_dec = input("Digite o ID da declaração para deletar: ")
-            deletar_por_id(int(id_dec))
-        elif opcao == "5":
-            limpar_banco()
-        elif opcao == "6":
-            mostrar_status_ids()
-        elif opcao == "7":
-            resetar_ids()
-        elif opcao == "8":
-            reset_completo()
-        elif opcao == "0":
-            print("\n👋 Até logo!\n")
+        try:
+            executar_opcao(opcao)
+        except ValueError as e:
+            print(f"\n❌ {e}\n")
+        if opcao == "0":
             break
-        else:
-            print("\n❌ Opção inválida!\n")
+
+def executar_opcao(opcao):
+    """Executa a opção escolhida no menu"""
+    if opcao == "1":
+        cpf = input("Digite o CPF para buscar: ")
+        buscar_por_cpf(cpf)
+    elif opcao == "2":
+        competencia = input("Competência (MM/AAAA) ou Enter para todas: ").strip()
+        estatisticas(competencia or None)
+    elif opcao == "3":
+        exportar_csv()
+    elif opcao == "4":
+        id_dec = input("Digite o ID da declaração para deletar: ")
+        deletar_por_id(int(id_dec))
+    elif opcao == "5":
+        limpar_banco()
+    elif opcao == "6":
+        mostrar_status_ids()
+    elif opcao == "7":
+        resetar_ids()
+    elif opcao == "8":
+        reset_completo()
+    elif opcao == "9":
+        listar_competencias()
+    elif opcao == "10":
+        competencia = input("Competência a arquivar (MM/AAAA): ")
+        arquivar_competencia(competencia)
+    elif opcao == "11":
+        arquivo = input("Planilha de entrada (CSV/XLSX): ").strip()
+        competencia = input("Competência (MM/AAAA) ou Enter para todas: ").strip()
+        saida = input("Arquivo CSV para as divergências (Enter para não exportar): ").strip()
+        reconciliar(arquivo, competencia or None, saida or None)
+    elif opcao == "12":
+        arquivo = input("Planilha (Enter para todas do diretório atual): ").strip()
+        limpar_cache([arquivo] if arquivo else None)
+    elif opcao == "0":
+        print("\n👋 Até logo!\n")
+    else:
+        print("\n❌ Opção inválida!\n")
+
+def criar_parser():
+    """Define os subcomandos da linha de comando (uso sem prompts, em scripts)"""
+    parser = argparse.ArgumentParser(description="Gerenciador do banco de dados EFD-REINF")
+    sub = parser.add_subparsers(dest='comando')
+    
+    buscar = sub.add_parser('buscar', help="busca declarações por CPF")
+    buscar.add_argument('cpf')
+    
+    stats = sub.add_parser('estatisticas', help="mostra estatísticas")
+    stats.add_argument('--competencia', help="MM/AAAA")
+    
+    sub.add_parser('exportar', help="exporta as declarações para CSV")
+    
+    deletar = sub.add_parser('deletar', help="deleta declarações em lote (filtros combinados com E)")
+    deletar.add_argument('--ids', type=int, nargs='+', help="lista de ids")
+    deletar.add_argument('--intervalo', type=int, nargs=2, metavar=('INICIO', 'FIM'), help="faixa de ids (inclusiva)")
+    deletar.add_argument('--cpfs-arquivo', help="arquivo com um CPF por linha")
+    deletar.add_argument('--competencia', help="MM/AAAA")
+    deletar.add_argument('--desde', help="data_cadastro inicial (AAAA-MM-DD [HH:MM:SS])")
+    deletar.add_argument('--ate', help="data_cadastro final (AAAA-MM-DD [HH:MM:SS])")
+    deletar.add_argument('--dry-run', action='store_true', help="apenas conta o que seria apagado")
+    deletar.add_argument('--sim', action='store_true', help="não pede confirmação")
+    
+    for nome, ajuda in (('limpar', "apaga todas as declarações"),
+                        ('resetar-ids', "renumera os ids sequencialmente"),
+                        ('reset-completo', "apaga tudo e reinicia a sequência de ids")):
+        comando = sub.add_parser(nome, help=ajuda)
+        comando.add_argument('--sim', action='store_true', help="não pede confirmação")
+    
+    sub.add_parser('status-ids', help="mostra o status dos ids")
+    sub.add_parser('competencias', help="lista as competências (partições)")
+    
+    arquivar = sub.add_parser('arquivar', help="compacta e torna somente leitura uma competência")
+    arquivar.add_argument('competencia', help="MM/AAAA")
+    
+    conferir = sub.add_parser('reconciliar', help="confere a planilha contra o banco (sai com código 2 se houver divergências)")
+    conferir.add_argument('arquivo', help="planilha de entrada (CSV/XLSX)")
+    conferir.add_argument('--competencia', help="MM/AAAA")
+    conferir.add_argument('--saida', help="CSV onde gravar todas as divergências")
+    
+    cache = sub.add_parser('limpar-cache', help="apaga o cache da planilha de entrada")
+    cache.add_argument('arquivos', nargs='*', help="planilhas (padrão: todas do diretório atual)")
+    
+    return parser
+
+def executar_comando(args):
+    """Executa o subcomando já interpretado pelo argparse"""
+    if args.comando == 'buscar':
+        buscar_por_cpf(args.cpf)
+    elif args.comando == 'estatisticas':
+        estatisticas(args.competencia)
+    elif args.comando == 'exportar':
+        exportar_csv()
+    elif args.comando == 'deletar':
+        deletar_em_lote(
+            ids=args.ids, intervalo=args.intervalo, arquivo_cpfs=args.cpfs_arquivo,
+            competencia=args.competencia, desde=args.desde, ate=args.ate,
+            dry_run=args.dry_run, confirmado=args.sim
+        )
+    elif args.comando == 'limpar':
+        limpar_banco(args.sim)
+    elif args.comando == 'status-ids':
+        mostrar_status_ids()
+    elif args.comando == 'resetar-ids':
+        resetar_ids(args.sim)
+    elif args.comando == 'reset-completo':
+        reset_completo(args.sim)
+    elif args.comando == 'competencias':
+        listar_competencias()
+    elif args.comando == 'arquivar':
+        arquivar_competencia(args.competencia)
+    elif args.comando == 'reconciliar':
+        if not reconciliar(args.arquivo, args.competencia, args.saida).empty:
+            sys.exit(2)
+    elif args.comando == 'limpar-cache':
+        limpar_cache(args.arquivos)
 
 if __name__ == "__main__":
+    args = criar_parser().parse_args()
     try:
-        menu()
+        init_db()
+        if args.comando:
+            executar_comando(args)
+        else:
+            menu()
     except KeyboardInterrupt:
         print("\n\n👋 Programa encerrado pelo usuário\n")
     except Exception as e:
         print(f"\n❌ Erro: {str(e)}\n")
+        if args.comando:
+            sys.exit(1)
 
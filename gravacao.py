@@ -0,0 +1,190 @@
+"""Gravação agrupada (group commit) das declarações recebidas pelo ``submit_efd``.
+
+Com vários workers enviando ao mesmo tempo, um ``commit()`` por declaração
+faz o fsync do disco virar o limite de vazão. Aqui as requisições entram
+numa fila e uma única thread gravadora junta o que chegar em até ``espera``
+segundos (ou ``tamanho_maximo`` declarações) e grava tudo em uma transação
+por competência. Cada requisição só é liberada depois do commit do seu lote,
+então a resposta continua significando "gravado em disco".
+"""
+
+import queue
+import threading
+import time
+
+import particoes
+from particoes import chave_competencia
+
+
+class _Pedido:
+    """Declaração na fila, com o evento que libera a requisição que a enviou."""
+
+    __slots__ = ('registro', 'id', 'erro', 'pronto', 'cancelado')
+
+    def __init__(self, registro):
+        """Guarda o registro; ``id`` ou ``erro`` são preenchidos pela thread gravadora."""
+        self.registro = registro
+        self.id = None
+        self.erro = None
+        self.pronto = threading.Event()
+        self.cancelado = False
+
+
+class GravadorAgrupado:
+    """Thread única que grava em lote as declarações enfileiradas por ``gravar``."""
+
+    def __init__(self, conectar, espera=0.001, tamanho_maximo=256, ao_gravar=None, tempo_limite=30):
+        """Recebe a função que abre a conexão principal e os limites de cada lote.
+
+        ``ao_gravar(quantidade, segundos)`` é chamado depois de cada lote
+        (usado para as métricas). ``tempo_limite`` é quanto, em segundos, uma
+        requisição espera pelo commit antes de desistir.
+        """
+        self.conectar = conectar
+        self.espera = espera
+        self.tamanho_maximo = tamanho_maximo
+        self.ao_gravar = ao_gravar
+        self.tempo_limite = tempo_limite
+        self._fila = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def gravar(self, registro):
+        """Enfileira a declaração e espera o commit do lote; retorna o id gravado.
+
+        Exceções da gravação (ex.: ``ParticaoArquivada``) são relançadas aqui,
+        na thread da requisição. Sem resposta em ``tempo_limite`` segundos,
+        levanta ``TimeoutError``; se o lote ainda não tiver começado, a
+        declaração é descartada, senão ela ainda pode acabar gravada.
+        """
+        self._iniciar()
+        pedido = _Pedido(registro)
+        self._fila.put(pedido)
+        if not pedido.pronto.wait(self.tempo_limite):
+            pedido.cancelado = True
+            raise TimeoutError(f"Gravação não confirmada em {self.tempo_limite}s")
+        if pedido.erro is not None:
+            raise pedido.erro
+        return pedido.id
+
+    def parar(self):
+        """Grava o que ainda estiver na fila e encerra a thread gravadora."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread:
+            self._fila.put(None)
+            thread.join()
+
+    def _iniciar(self):
+        """Sobe a thread gravadora na primeira gravação (ou se ela tiver morrido)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name='gravador-efd', daemon=True)
+                self._thread.start()
+
+    def _proximo_lote(self, lote):
+        """Bloqueia até a primeira declaração e junta em ``lote`` as que chegarem na janela.
+
+        Retorna ``False`` quando recebe o pedido de parada.
+        """
+        primeiro = self._fila.get()
+        if primeiro is None:
+            return False
+        lote.append(primeiro)
+        prazo = time.monotonic() + self.espera
+        while len(lote) < self.tamanho_maximo:
+            restante = prazo - time.monotonic()
+            try:
+                pedido = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if pedido is None:
+                self._fila.put(None)
+                break
+            lote.append(pedido)
+        return True
+
+    def _executar(self):
+        """Laço da thread gravadora; a conexão é aberta e usada só nesta thread.
+
+        Qualquer erro (ao conectar, montar ou gravar o lote) é entregue às
+        requisições do lote e o laço continua, reabrindo a conexão no lote
+        seguinte.
+        """
+        conn = None
+        try:
+            while True:
+                lote = []
+                inicio = time.perf_counter()
+                try:
+                    if not self._proximo_lote(lote):
+                        break
+                    inicio = time.perf_counter()
+                    if conn is None:
+                        conn = self.conectar()
+                    self._gravar_lote(conn, lote)
+                except Exception as e:
+                    # nunca deixa requisições esperando por um lote que não vai terminar
+                    for pedido in lote:
+                        if pedido.id is None and pedido.erro is None:
+                            pedido.erro = e
+                    conn = self._fechar(conn)
+                finally:
+                    for pedido in lote:
+                        pedido.pronto.set()
+                if self.ao_gravar and lote:
+                    try:
+                        self.ao_gravar(len(lote), time.perf_counter() - inicio)
+                    except Exception:
+                        pass
+        finally:
+            self._fechar(conn)
+
+    @staticmethod
+    def _fechar(conn):
+        """Fecha a conexão ignorando erros; devolve ``None`` para forçar reabrir."""
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        return None
+
+    def _gravar_lote(self, conn, lote):
+        """Grava o lote com uma transação por competência.
+
+        Se a transação de uma competência falhar, ela é desfeita e as
+        declarações dela são regravadas uma a uma, para que só a requisição
+        problemática receba o erro.
+        """
+        por_chave = {}
+        for pedido in lote:
+            if pedido.cancelado:
+                pedido.erro = TimeoutError("Requisição desistiu antes da gravação")
+                continue
+            try:
+                chave = chave_competencia(pedido.registro.get('data'))
+            except Exception as e:
+                pedido.erro = e
+                continue
+            por_chave.setdefault(chave, []).append(pedido)
+
+        for pedidos in por_chave.values():
+            try:
+                ids = particoes.inserir_declaracoes(conn, [pedido.registro for pedido in pedidos])
+            except Exception:
+                self._gravar_individualmente(conn, pedidos)
+                continue
+            for pedido, id_gravado in zip(pedidos, ids):
+                pedido.id = id_gravado
+
+    @staticmethod
+    def _gravar_individualmente(conn, pedidos):
+        """Grava cada declaração em sua própria transação, guardando o erro de cada uma."""
+        for pedido in pedidos:
+            try:
+                pedido.id = particoes.inserir_declaracao(conn, pedido.registro)
+            except Exception as e:
+                pedido.erro = e
@@ -0,0 +1,190 @@
+"""Métricas do servidor Flask no formato de texto do Prometheus.
+
+Os histogramas usam baldes fixos e contadores pré-alocados por série, então
+registrar uma observação não cria objetos novos: apenas incrementa posições
+de uma lista já existente sob um lock.
+"""
+
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+
+BALDES_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histograma:
+    """Histograma com baldes fixos, uma série por rótulo."""
+
+    def __init__(self, nome, descricao, rotulo=None, baldes=BALDES_PADRAO):
+        """Define o nome da métrica, o rótulo opcional e os limites dos baldes."""
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulo = rotulo
+        self.baldes = tuple(baldes)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _serie(self, valor_rotulo):
+        """Retorna a série do rótulo, criando-a na primeira observação."""
+        serie = self._series.get(valor_rotulo)
+        if serie is None:
+            # [contagem por balde..., +Inf, soma]
+            serie = self._series.setdefault(valor_rotulo, [0] * (len(self.baldes) + 1) + [0.0])
+        return serie
+
+    def observar(self, segundos, valor_rotulo=''):
+        """Registra uma duração em segundos."""
+        indice = bisect_left(self.baldes, segundos)
+        with self._lock:
+            serie = self._serie(valor_rotulo)
+            serie[indice] += 1
+            serie[-1] += segundos
+
+    def exportar(self):
+        """Gera as linhas do histograma no formato de texto do Prometheus."""
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            series = [(rotulo, list(serie)) for rotulo, serie in sorted(self._series.items())]
+        for valor_rotulo, serie in series:
+            prefixo = f'{self.rotulo}="{valor_rotulo}",' if self.rotulo else ''
+            acumulado = 0
+            for limite, contagem in zip(self.baldes, serie):
+                acumulado += contagem
+                linhas.append(f'{self.nome}_bucket{{{prefixo}le="{limite}"}} {acumulado}')
+            acumulado += serie[len(self.baldes)]
+            linhas.append(f'{self.nome}_bucket{{{prefixo}le="+Inf"}} {acumulado}')
+            sufixo = f'{{{prefixo[:-1]}}}' if prefixo else ''
+            linhas.append(f'{self.nome}_sum{sufixo} {serie[-1]:.6f}')
+            linhas.append(f'{self.nome}_count{sufixo} {acumulado}')
+        return linhas
+
+
+class Medidor:
+    """Valor instantâneo que pode subir e descer (ex.: requisições em andamento)."""
+
+    def __init__(self, nome, descricao):
+        """Define o nome da métrica e inicia o valor em zero."""
+        self.nome = nome
+        self.descricao = descricao
+        self.valor = 0
+        self._lock = threading.Lock()
+
+    def somar(self, delta):
+        """Soma ``delta`` (negativo para decrementar) ao valor atual."""
+        with self._lock:
+            self.valor += delta
+
+    def exportar(self):
+        """Gera as linhas do medidor no formato de texto do Prometheus."""
+        return [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} gauge", f"{self.nome} {self.valor}"]
+
+
+def exportar_medidor(nome, descricao, valor):
+    """Gera as linhas de um medidor calculado no momento da coleta."""
+    return [f"# HELP {nome} {descricao}", f"# TYPE {nome} gauge", f"{nome} {valor}"]
+
+
+duracao_requisicoes = Histograma(
+    'efd_http_request_duration_seconds', 'Latência das requisições HTTP por rota.', rotulo='rota'
+)
+duracao_sqlite = Histograma(
+    'efd_sqlite_query_duration_seconds', 'Tempo gasto em comandos SQLite (execute, fetch e commit).'
+)
+requisicoes_em_andamento = Medidor('efd_http_requests_in_flight', 'Requisições HTTP em andamento.')
+tamanho_lotes_gravacao = Histograma(
+    'efd_group_commit_batch_size', 'Declarações gravadas por commit no modo de gravação agrupada.',
+    baldes=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+duracao_lotes_gravacao = Histograma(
+    'efd_group_commit_duration_seconds', 'Tempo de gravação (inserts e commit) de cada lote agrupado.'
+)
+
+
+class CursorMedido(sqlite3.Cursor):
+    """Cursor que soma ao histograma o tempo de execução e leitura das linhas."""
+
+    def execute(self, *args, **kwargs):
+        """Executa o comando cronometrando sua duração."""
+        inicio = time.perf_counter()
+        try:
+            return super().execute(*args, **kwargs)
+        finally:
+            duracao_sqlite.observar(time.perf_counter() - inicio)
+
+    def executemany(self, *args, **kwargs):
+        """Executa o comando em lote cronometrando sua duração."""
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(*args, **kwargs)
+        finally:
+            duracao_sqlite.observar(time.perf_counter() - inicio)
+
+    def fetchone(self):
+        """Lê uma linha cronometrando a leitura."""
+        inicio = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            duracao_sqlite.observar(time.perf_counter() - inicio)
+
+    def fetchmany(self, *args, **kwargs):
+        """Lê um lote de linhas cronometrando a leitura."""
+        inicio = time.perf_counter()
+        try:
+            return super().fetchmany(*args, **kwargs)
+        finally:
+            duracao_sqlite.observar(time.perf_counter() - inicio)
+
+    def fetchall(self):
+        """Lê todas as linhas cronometrando a leitura."""
+        inicio = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            duracao_sqlite.observar(time.perf_counter() - inicio)
+
+
+class ConexaoMedida(sqlite3.Connection):
+    """Conexão SQLite cujos cursores e commits são cronometrados."""
+
+    def cursor(self, factory=CursorMedido):
+        """Cria um cursor cronometrado."""
+        return super().cursor(factory)
+
+    def execute(self, *args, **kwargs):
+        """Executa pela conexão usando um cursor cronometrado (o atalho do sqlite3 não usa ``cursor()``)."""
+        return self.cursor().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        """Executa em lote pela conexão usando um cursor cronometrado."""
+        return self.cursor().executemany(*args, **kwargs)
+
+    def commit(self):
+        """Confirma a transação cronometrando o commit."""
+        inicio = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            duracao_sqlite.observar(time.perf_counter() - inicio)
+
+
+def instalar(app):
+    """Registra no app o middleware de tempo por rota, controlado por ``METRICAS_ATIVAS``."""
+    @app.before_request
+    def _iniciar_medicao():
+        if not app.config.get('METRICAS_ATIVAS'):
+            return
+        g.metricas_inicio = time.perf_counter()
+        requisicoes_em_andamento.somar(1)
+
+    @app.teardown_request
+    def _finalizar_medicao(_erro=None):
+        inicio = g.pop('metricas_inicio', None)
+        if inicio is None:
+            return
+        requisicoes_em_andamento.somar(-1)
+        rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+        duracao_requisicoes.observar(time.perf_counter() - inicio, rota)
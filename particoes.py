@@ -0,0 +1,313 @@
+"""Particionamento das declarações EFD-REINF por competência.
+
+Cada competência (campo ``data``, ex. ``01/2025``) fica em um arquivo SQLite
+próprio dentro de ``particoes/``. O ``cadastros.db`` principal guarda apenas
+o catálogo de partições e o índice global de ids (``efd_indice``), que mantém
+os ids únicos entre arquivos e diz em qual partição cada declaração está.
+
+Competências fechadas podem ser arquivadas: o arquivo é compactado com
+``VACUUM`` e passa a ser aberto somente para leitura.
+"""
+
+import heapq
+import os
+import re
+import sqlite3
+
+from entrada import registrar_normalizar_cpf
+
+DB_PATH = 'cadastros.db'
+DIRETORIO_PARTICOES = 'particoes'
+SEM_COMPETENCIA = 'sem_competencia'
+
+COLUNAS_DECLARACAO = [
+    'id', 'data', 'cnpj', 'cpf', 'dependentes', 'planos_saude', 'dependentes_planos',
+    'data_cadastro', 'valor_titular_centavos', 'valor_dependentes_centavos'
+]
+
+_PADRAO_COMPETENCIA = re.compile(r'^\s*(\d{1,2})/(\d{4})\s*$')
+
+
+class ParticaoArquivada(Exception):
+    """Tentativa de escrita em uma competência já arquivada (somente leitura)."""
+
+
+def chave_competencia(data):
+    """Converte a competência ``MM/AAAA`` na chave da partição (``AAAA_MM``)."""
+    encontrado = _PADRAO_COMPETENCIA.match(str(data or ''))
+    if not encontrado or not 1 <= int(encontrado.group(1)) <= 12:
+        return SEM_COMPETENCIA
+    return f"{encontrado.group(2)}_{int(encontrado.group(1)):02d}"
+
+
+def chave_filtro(competencia):
+    """Chave da partição para filtrar consultas por ``competencia`` (``MM/AAAA``).
+
+    Diferente de ``chave_competencia``, não cai em ``SEM_COMPETENCIA``: essa
+    partição só recebe inserções com data inválida e nunca é alvo de filtro.
+    Levanta ``ValueError`` se a competência não estiver no formato esperado.
+    """
+    chave = chave_competencia(competencia)
+    if chave == SEM_COMPETENCIA:
+        raise ValueError(f"Competência inválida: '{competencia}' (use MM/AAAA)")
+    return chave
+
+
+def caminho_particao(chave):
+    """Caminho do arquivo SQLite da partição."""
+    return os.path.join(DIRETORIO_PARTICOES, f"cadastros_{chave}.db")
+
+
+def criar_esquema(cursor, esquema='main'):
+    """Cria a tabela de declarações de uma partição (ids vêm de ``efd_indice``)."""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {esquema}.efd_declaracoes (
+            id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL,
+            cnpj TEXT NOT NULL,
+            cpf TEXT NOT NULL,
+            dependentes TEXT,
+            planos_saude TEXT,
+            dependentes_planos TEXT,
+            data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            valor_titular_centavos INTEGER NOT NULL DEFAULT 0,
+            valor_dependentes_centavos INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {esquema}.idx_efd_cnpj ON efd_declaracoes (cnpj)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {esquema}.idx_efd_cpf ON efd_declaracoes (cpf)')
+
+
+def init_catalogo(cursor):
+    """Cria no banco principal o índice global de ids e o catálogo de partições."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS efd_indice (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            competencia TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_efd_indice_competencia ON efd_indice (competencia)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS efd_particoes (
+            competencia TEXT PRIMARY KEY,
+            arquivo TEXT NOT NULL,
+            arquivada INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def listar_particoes(conn, chaves=None):
+    """Retorna ``[(chave, arquivada)]`` das partições, opcionalmente filtradas."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT competencia, arquivada FROM efd_particoes ORDER BY competencia')
+    particoes = [(chave, bool(arquivada)) for chave, arquivada in cursor.fetchall()]
+    if chaves is not None:
+        chaves = set(chaves)
+        particoes = [particao for particao in particoes if particao[0] in chaves]
+    return particoes
+
+
+def abrir_particao(chave, arquivada=False, factory=sqlite3.Connection):
+    """Abre a conexão com uma partição; arquivadas são abertas somente para leitura."""
+    caminho = caminho_particao(chave)
+    if arquivada:
+        conn = sqlite3.connect(f"file:{os.path.abspath(caminho)}?mode=ro", uri=True, factory=factory)
+    else:
+        conn = sqlite3.connect(caminho, factory=factory)
+    registrar_normalizar_cpf(conn)
+    return conn
+
+
+def garantir_particao(conn, chave):
+    """Cria a partição e a registra no catálogo se ainda não existir."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT arquivada FROM efd_particoes WHERE competencia = ?', (chave,))
+    linha = cursor.fetchone()
+    if linha:
+        if linha[0]:
+            raise ParticaoArquivada(f"Competência {chave} está arquivada (somente leitura)")
+        return
+
+    os.makedirs(DIRETORIO_PARTICOES, exist_ok=True)
+    particao = sqlite3.connect(caminho_particao(chave))
+    criar_esquema(particao.cursor())
+    particao.commit()
+    particao.close()
+    # OR IGNORE: outra conexão pode ter criado a mesma partição ao mesmo tempo
+    cursor.execute('INSERT OR IGNORE INTO efd_particoes (competencia, arquivo) VALUES (?, ?)', (chave, caminho_particao(chave)))
+    conn.commit()
+
+
+def inserir_declaracoes(conn, registros):
+    """Grava declarações (dicionários por coluna) nas partições de cada competência.
+
+    Cada partição é anexada (``ATTACH``) à conexão principal, para que o id
+    global e a linha sejam gravados na mesma transação. Retorna os ids na
+    ordem dos registros.
+    """
+    por_chave = {}
+    for posicao, registro in enumerate(registros):
+        por_chave.setdefault(chave_competencia(registro.get('data')), []).append((posicao, registro))
+
+    colunas = COLUNAS_DECLARACAO[1:]
+    colunas_insert = [coluna for coluna in colunas if coluna != 'data_cadastro']
+    ids = [None] * len(registros)
+    cursor = conn.cursor()
+    for chave, itens in por_chave.items():
+        garantir_particao(conn, chave)
+        cursor.execute('ATTACH DATABASE ? AS particao', (caminho_particao(chave),))
+        try:
+            for posicao, registro in itens:
+                cursor.execute('INSERT INTO efd_indice (competencia) VALUES (?)', (chave,))
+                ids[posicao] = cursor.lastrowid
+                cursor.execute(
+                    f'INSERT INTO particao.efd_declaracoes (id, {", ".join(colunas_insert)}) '
+                    f'VALUES (?, {", ".join("?" for _ in colunas_insert)})',
+                    [ids[posicao]] + [registro.get(coluna) for coluna in colunas_insert]
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute('DETACH DATABASE particao')
+    return ids
+
+
+def inserir_declaracao(conn, registro):
+    """Grava uma declaração na partição da sua competência e retorna o id."""
+    return inserir_declaracoes(conn, [registro])[0]
+
+
+def localizar(conn, declaracao_id):
+    """Retorna ``(chave, arquivada)`` da partição que contém a declaração, ou ``None``."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT i.competencia, p.arquivada FROM efd_indice i
+        JOIN efd_particoes p ON p.competencia = i.competencia
+        WHERE i.id = ?
+    ''', (declaracao_id,))
+    linha = cursor.fetchone()
+    return (linha[0], bool(linha[1])) if linha else None
+
+
+def _linhas(chave, arquivada, sql, parametros, factory):
+    """Gera as linhas de uma consulta em uma partição, fechando a conexão no fim."""
+    particao = abrir_particao(chave, arquivada, factory)
+    try:
+        cursor = particao.cursor()
+        cursor.execute(sql, parametros)
+        while True:
+            lote = cursor.fetchmany(500)
+            if not lote:
+                break
+            yield from lote
+    finally:
+        particao.close()
+
+
+def consultar(conn, sql, parametros=(), chaves=None, factory=sqlite3.Connection):
+    """Executa ``sql`` em cada partição selecionada, uma de cada vez."""
+    for chave, arquivada in listar_particoes(conn, chaves):
+        yield from _linhas(chave, arquivada, sql, parametros, factory)
+
+
+def consultar_ordenado(conn, sql, parametros=(), chaves=None, decrescente=False, factory=sqlite3.Connection):
+    """Intercala por id os resultados das partições; ``sql`` deve vir ordenado por id.
+
+    Cada partição é lida em streaming, então a memória não cresce com o número
+    de linhas, apenas com o número de partições consultadas.
+    """
+    fontes = [
+        _linhas(chave, arquivada, sql, parametros, factory)
+        for chave, arquivada in listar_particoes(conn, chaves)
+    ]
+    return heapq.merge(*fontes, key=lambda linha: linha[0], reverse=decrescente)
+
+
+def tamanho_total():
+    """Soma em bytes do banco principal e de todas as partições."""
+    total = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+    if os.path.isdir(DIRETORIO_PARTICOES):
+        for nome in os.listdir(DIRETORIO_PARTICOES):
+            total += os.path.getsize(os.path.join(DIRETORIO_PARTICOES, nome))
+    return total
+
+
+def arquivar(conn, chave):
+    """Compacta a partição com VACUUM e a marca como somente leitura."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT arquivada FROM efd_particoes WHERE competencia = ?', (chave,))
+    linha = cursor.fetchone()
+    if not linha:
+        raise KeyError(f"Competência {chave} não encontrada")
+    if linha[0]:
+        return False
+
+    particao = sqlite3.connect(caminho_particao(chave))
+    particao.execute('VACUUM')
+    particao.close()
+    os.chmod(caminho_particao(chave), 0o444)
+    cursor.execute('UPDATE efd_particoes SET arquivada = 1 WHERE competencia = ?', (chave,))
+    conn.commit()
+    return True
+
+
+def remover_todas(conn):
+    """Apaga todas as partições, o catálogo e o índice global de ids."""
+    cursor = conn.cursor()
+    for chave, _ in listar_particoes(conn):
+        caminho = caminho_particao(chave)
+        if os.path.exists(caminho):
+            os.chmod(caminho, 0o644)
+            os.remove(caminho)
+    cursor.execute('DELETE FROM efd_particoes')
+    cursor.execute('DELETE FROM efd_indice')
+    cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'efd_indice'")
+    conn.commit()
+
+
+def migrar_legado(conn):
+    """Move a antiga tabela única ``efd_declaracoes`` do banco principal para as partições."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'efd_declaracoes'")
+    if not cursor.fetchone():
+        return 0
+
+    cursor.execute('SELECT id, data FROM efd_declaracoes')
+    por_chave = {}
+    for declaracao_id, data in cursor.fetchall():
+        por_chave.setdefault(chave_competencia(data), []).append((declaracao_id,))
+
+    colunas = ', '.join(COLUNAS_DECLARACAO)
+    for chave, ids in por_chave.items():
+        garantir_particao(conn, chave)
+        cursor.execute('ATTACH DATABASE ? AS particao', (caminho_particao(chave),))
+        try:
+            cursor.executemany(
+                f'INSERT INTO particao.efd_declaracoes ({colunas}) SELECT {colunas} FROM main.efd_declaracoes WHERE id = ?',
+                ids
+            )
+            cursor.executemany(
+                'INSERT INTO efd_indice (id, competencia) VALUES (?, ?)',
+                [(declaracao_id, chave) for (declaracao_id,) in ids]
+            )
+            cursor.executemany('DELETE FROM main.efd_declaracoes WHERE id = ?', ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute('DETACH DATABASE particao')
+
+    # Preserva a sequência antiga para que ids apagados não sejam reutilizados
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'efd_declaracoes'")
+    linha = cursor.fetchone()
+    if linha:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'efd_indice'", linha)
+        if not cursor.rowcount:
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('efd_indice', ?)", linha)
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'efd_declaracoes'")
+    cursor.execute('DROP TABLE efd_declaracoes')
+    conn.commit()
+    return sum(len(ids) for ids in por_chave.values())
@@ -0,0 +1,186 @@
+"""Conferência entre a planilha de entrada e as declarações gravadas no banco.
+
+Planilha e banco viram tabelas do pandas (titulares e dependentes), lidas em
+bloco: a planilha é agrupada por titular sem ``iterrows`` e os JSONs das
+declarações são expandidos pelo próprio SQLite (``json_each``). O confronto
+é feito com ``merge`` (junção por hash) sobre o CPF normalizado, então o
+custo cresce com o número de linhas e não com consultas por CPF.
+"""
+
+import numpy as np
+import pandas as pd
+
+import particoes
+from cache_entrada import COLUNA_GRUPO, carregar_dataframe
+from entrada import COLUNA_CENTAVOS, cpf_normalizado_sql
+from valores import formatar_centavos, serie_para_centavos
+
+COLUNAS_DIVERGENCIA = ['tipo', 'cpf_titular', 'cpf_dependente', 'esperado', 'encontrado', 'ids']
+
+TIPOS_DIVERGENCIA = {
+    'titular_ausente': "Titulares da planilha sem declaração no banco",
+    'titular_duplicado': "Titulares com mais de uma declaração no banco",
+    'titular_repetido_planilha': "Titulares repetidos na planilha",
+    'valor_titular': "Valor do titular diferente",
+    'dependente_ausente': "Dependentes da planilha ausentes na declaração",
+    'dependente_extra': "Dependentes na declaração que não estão na planilha",
+    'valor_dependente': "Valor do dependente diferente",
+    'titular_extra': "Declarações de titulares que não estão na planilha",
+}
+
+# CPF normalizado (só dígitos) já no SQLite, sem passar por str.replace do pandas
+_SQL_TITULARES = f'SELECT id, {cpf_normalizado_sql("cpf")}, valor_titular_centavos FROM efd_declaracoes'
+_SQL_DEPENDENTES = f'''
+    SELECT d.id, {cpf_normalizado_sql("json_extract(j.value, '$.cpf')")}
+    FROM efd_declaracoes d, json_each(d.dependentes) j
+    WHERE json_valid(d.dependentes)
+'''
+_SQL_VALORES_DEPENDENTES = f'''
+    SELECT d.id, {cpf_normalizado_sql("json_extract(j.value, '$.cpf')")},
+           json_extract(j.value, '$.valor_centavos'), json_extract(j.value, '$.valor')
+    FROM efd_declaracoes d, json_each(d.dependentes_planos) j
+    WHERE json_valid(d.dependentes_planos)
+'''
+
+
+def _normalizar_cpfs(serie):
+    """Versão vetorizada de ``entrada.normalizar_cpf``."""
+    return serie.astype(str).str.replace(r'\D', '', regex=True)
+
+
+def tabelas_da_planilha(df):
+    """Separa a planilha preparada (``cache_entrada.preparar_dataframe``) em titulares e dependentes.
+
+    Usa a numeração de grupos da coluna ``_GRUPO``. Retorna
+    ``(titulares, dependentes)`` com CPFs normalizados e valores em centavos.
+    """
+    grupo = df[COLUNA_GRUPO].to_numpy()
+    # a primeira linha de cada grupo é o titular
+    titular = np.r_[True, np.diff(grupo) != 0] if len(grupo) else np.zeros(0, dtype=bool)
+    tabela = pd.DataFrame({
+        'grupo': grupo,
+        'cpf': _normalizar_cpfs(df['CPF']).to_numpy(),
+        'valor': df[COLUNA_CENTAVOS].astype('int64').to_numpy(),
+    })
+
+    titulares = tabela[titular].rename(columns={'cpf': 'cpf_titular', 'valor': 'valor_titular'})
+    dependentes = tabela[~titular].merge(titulares[['grupo', 'cpf_titular']], on='grupo')
+    dependentes = dependentes.rename(columns={'cpf': 'cpf_dependente'})
+    return titulares, dependentes[['grupo', 'cpf_titular', 'cpf_dependente', 'valor']]
+
+
+def carregar_planilha(caminho):
+    """Carrega a planilha (do cache, se válido) como as tabelas de ``tabelas_da_planilha``."""
+    df, _ = carregar_dataframe(caminho)
+    return tabelas_da_planilha(df)
+
+
+def _ler(conn, sql, colunas, chaves):
+    """Lê em bloco o resultado de ``sql`` em todas as partições selecionadas."""
+    return pd.DataFrame.from_records(particoes.consultar(conn, sql, chaves=chaves), columns=colunas)
+
+
+def tabelas_do_banco(conn, chaves=None):
+    """Lê as declarações gravadas como ``(titulares, dependentes)``.
+
+    Um dependente conta como presente se estiver em ``dependentes``; o valor
+    vem de ``dependentes_planos`` e fica ``0`` quando não foi informado, como
+    a automação faz ao pular valores zerados.
+    """
+    titulares = _ler(conn, _SQL_TITULARES, ['id', 'cpf_titular', 'valor_titular'], chaves)
+    titulares['valor_titular'] = titulares['valor_titular'].fillna(0).astype('int64')
+
+    nomes = _ler(conn, _SQL_DEPENDENTES, ['id', 'cpf_dependente'], chaves)
+    valores = _ler(conn, _SQL_VALORES_DEPENDENTES, ['id', 'cpf_dependente', 'valor', 'valor_texto'], chaves)
+    # registros antigos sem ``valor_centavos`` ainda têm o texto original
+    centavos = pd.to_numeric(valores['valor'], errors='coerce').astype('Int64')
+    antigos = centavos.isna()
+    if antigos.any():
+        centavos[antigos] = serie_para_centavos(valores.loc[antigos, 'valor_texto'])
+    valores['valor'] = centavos.fillna(0).astype('int64')
+    valores = valores.groupby(['id', 'cpf_dependente'], as_index=False)['valor'].sum()
+
+    dependentes = nomes.drop_duplicates().merge(valores, on=['id', 'cpf_dependente'], how='left')
+    dependentes['valor'] = dependentes['valor'].fillna(0).astype('int64')
+    return titulares, dependentes
+
+
+def _divergencias(tipo, tabela, esperado=None, encontrado=None, ids='id'):
+    """Monta as linhas de divergência de um tipo a partir de ``tabela``."""
+    def coluna(nome, formatar=False):
+        if nome is None or nome not in tabela:
+            return ''
+        return tabela[nome].map(formatar_centavos) if formatar else tabela[nome].astype(str)
+
+    return pd.DataFrame({
+        'tipo': tipo,
+        'cpf_titular': tabela['cpf_titular'],
+        'cpf_dependente': coluna('cpf_dependente'),
+        'esperado': coluna(esperado, formatar=True),
+        'encontrado': coluna(encontrado, formatar=True),
+        'ids': coluna(ids),
+    }, columns=COLUNAS_DIVERGENCIA)
+
+
+def reconciliar(planilha, banco):
+    """Confronta as tabelas da planilha com as do banco.
+
+    Para titulares com várias declarações, compara a mais recente (maior id).
+    Quando um titular se repete na planilha, vale o último grupo. Retorna um
+    DataFrame com ``COLUNAS_DIVERGENCIA`` (vazio quando tudo confere).
+    """
+    titulares_in, dependentes_in = planilha
+    titulares_db, dependentes_db = banco
+    partes = []
+
+    repetidos = titulares_in[titulares_in['cpf_titular'].duplicated(keep=False)]
+    if not repetidos.empty:
+        grupos = repetidos.groupby('cpf_titular')['grupo'].agg(lambda g: ','.join(map(str, g))).reset_index()
+        partes.append(_divergencias('titular_repetido_planilha', grupos, ids='grupo'))
+    titulares_in = titulares_in.drop_duplicates('cpf_titular', keep='last')
+    dependentes_in = dependentes_in[dependentes_in['grupo'].isin(titulares_in['grupo'])]
+
+    titulares_db = titulares_db.sort_values('id')
+    duplicados = titulares_db[titulares_db['cpf_titular'].duplicated(keep=False)]
+    if not duplicados.empty:
+        ids = duplicados.groupby('cpf_titular')['id'].agg(lambda i: ','.join(map(str, i))).reset_index()
+        partes.append(_divergencias('titular_duplicado', ids))
+    recentes = titulares_db.drop_duplicates('cpf_titular', keep='last')
+
+    titulares = titulares_in.merge(recentes, on='cpf_titular', how='outer',
+                                   suffixes=('_esperado', '_encontrado'), indicator=True)
+    partes.append(_divergencias('titular_ausente', titulares[titulares['_merge'] == 'left_only'], ids=None))
+    ambos = titulares[titulares['_merge'] == 'both'].astype({'id': 'int64'})
+    partes.append(_divergencias(
+        'valor_titular', ambos[ambos['valor_titular_esperado'] != ambos['valor_titular_encontrado']],
+        'valor_titular_esperado', 'valor_titular_encontrado'
+    ))
+    extras = titulares[titulares['_merge'] == 'right_only'].copy()
+    extras['id'] = extras['id'].astype('int64')
+    partes.append(_divergencias('titular_extra', extras))
+
+    # dependentes: só dos titulares presentes nos dois lados
+    esperados = (
+        dependentes_in[dependentes_in['cpf_titular'].isin(ambos['cpf_titular'])]
+        .groupby(['cpf_titular', 'cpf_dependente'], as_index=False)['valor'].sum()
+    )
+    encontrados = dependentes_db.merge(ambos[['id', 'cpf_titular']], on='id')
+    dependentes = esperados.merge(encontrados, on=['cpf_titular', 'cpf_dependente'], how='outer',
+                                  suffixes=('_esperado', '_encontrado'), indicator=True)
+    dependentes['id'] = dependentes['cpf_titular'].map(ambos.set_index('cpf_titular')['id'])
+    partes.append(_divergencias(
+        'dependente_ausente', dependentes[dependentes['_merge'] == 'left_only'], 'valor_esperado'
+    ))
+    partes.append(_divergencias(
+        'dependente_extra', dependentes[dependentes['_merge'] == 'right_only'], encontrado='valor_encontrado'
+    ))
+    ambos = dependentes[dependentes['_merge'] == 'both']
+    partes.append(_divergencias(
+        'valor_dependente', ambos[ambos['valor_esperado'] != ambos['valor_encontrado']],
+        'valor_esperado', 'valor_encontrado'
+    ))
+
+    partes = [parte for parte in partes if not parte.empty]
+    if not partes:
+        return pd.DataFrame(columns=COLUNAS_DIVERGENCIA)
+    return pd.concat(partes, ignore_index=True)
@@ -5,57 +5,146 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (
+    ElementNotInteractableException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    UnexpectedAlertPresentException,
+    WebDriverException,
+)
+import argparse
+import heapq
+import json
+import random
+import threading
 import time
+import urllib.error
+import urllib.parse
+import urllib.request
 import pandas as pd
 import sqlite3
 import os
 import socket
 
+import cache_entrada
+import delta
+from entrada import hash_grupo, obter_valor
+
 # Configurações
-url_base = 'http://localhost:5000'
+url_base = os.environ.get('URL_BASE', 'http://localhost:5000')
 data = '01/2025'
 cnpj = '10.000.000/0001-00'
 operadora = '10.000.000/0001-00'
-COLUNAS_VALOR = ['TOTAL', 'VALOR', 'VALOR TOTAL', 'VALOR_TOTAL']
 MAX_GRUPOS = int(os.environ.get('MAX_GRUPOS', '0'))
 CHECKPOINT_FILE = 'checkpoint.txt'
+# Grupos já resolvidos depois do checkpoint (à espera de um reprocessamento anterior)
+RESOLVIDOS_FILE = 'checkpoint_resolvidos.txt'
+FALHAS_FILE = 'falhas.txt'
+# Envia apenas grupos novos ou alterados desde o último envio (DELTA=0 envia todos)
+DELTA = os.environ.get('DELTA', '1') != '0'
 
-# Ler dados do Excel
-dados = pd.read_csv('dados_ficticios.csv', sep=';')
+# Reprocessamento de falhas transitórias
+MAX_TENTATIVAS = int(os.environ.get('MAX_TENTATIVAS', '3'))
+BACKOFF_BASE = float(os.environ.get('BACKOFF_BASE', '2'))
+BACKOFF_MAX = float(os.environ.get('BACKOFF_MAX', '60'))
 
-'''
-def formatar_valor(valor):
-    """Formata um valor para 2 casas decimais no padrão brasileiro (FUNÇÃO APENAS PARA O .xlsx ORIGINAL)"""
-    try:
-        if isinstance(valor, str):
-            valor = valor.replace(',', '.')
-        valor_float = float(valor)
-        return f"{valor_float:.2f}".replace('.', ',')
-    except (ValueError, TypeError):
-        return '0,00'
-'''
+# Modo worker: grupos distribuídos pelo coordenador do app.py
+COORDENADOR_URL = os.environ.get('COORDENADOR_URL', url_base)
+TAMANHO_LEASE = int(os.environ.get('TAMANHO_LEASE', '5'))
+LEASE_TIMEOUT = int(os.environ.get('LEASE_TIMEOUT', '300'))
 
-def limpar_dataframe(df):
-    """Limpa o dataframe removendo linhas com valores nulos"""
-    df_limpo = df.dropna(subset=['NOME', 'CPF', 'DEPENDENCIA'])
-    df_limpo = df_limpo[
-        (df_limpo['NOME'].astype(str).str.strip() != '') &
-        (df_limpo['CPF'].astype(str).str.strip() != '') &
-        (df_limpo['DEPENDENCIA'].astype(str).str.strip() != '')
-    ]
-    return df_limpo
+# Classes de falha
+FALHA_TIMEOUT = 'timeout'
+FALHA_ELEMENTO = 'elemento_nao_encontrado'
+FALHA_SERVIDOR = 'servidor_indisponivel'
+FALHA_VALIDACAO = 'validacao'
+FALHAS_TRANSITORIAS = {FALHA_TIMEOUT, FALHA_ELEMENTO, FALHA_SERVIDOR}
+
+# Planilha de entrada (CSV ou XLSX); a versão limpa e agrupada fica em cache ao lado dela
+ARQUIVO_DADOS = os.environ.get('ARQUIVO_DADOS', 'dados_ficticios.csv')
 
 def verificar_servidor():
     """Verifica se o servidor Flask está rodando"""
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.settimeout(2)
-        result = sock.connect_ex(('localhost', 5000))
+        endereco = urllib.parse.urlsplit(url_base)
+        result = sock.connect_ex((endereco.hostname or 'localhost', endereco.port or 80))
         sock.close()
         return result == 0
     except:
         return False
 
+def classificar_falha(exc):
+    """Classifica a exceção de uma etapa para decidir se vale reprocessar."""
+    mensagem = str(exc)
+    if isinstance(exc, UnexpectedAlertPresentException):
+        # Alertas do formulário indicam dado recusado pela validação da página
+        return FALHA_VALIDACAO
+    if isinstance(exc, NoSuchElementException) and ('option' in mensagem or 'visible text' in mensagem):
+        # Select sem a opção procurada: o dado não corresponde ao formulário
+        return FALHA_VALIDACAO
+    if isinstance(exc, TimeoutException):
+        return FALHA_TIMEOUT
+    if isinstance(exc, (NoSuchElementException, StaleElementReferenceException, ElementNotInteractableException)):
+        return FALHA_ELEMENTO
+    if isinstance(exc, (ConnectionError, OSError)) or 'ERR_CONNECTION' in mensagem:
+        return FALHA_SERVIDOR
+    if isinstance(exc, WebDriverException):
+        return FALHA_SERVIDOR if not verificar_servidor() else FALHA_TIMEOUT
+    return FALHA_VALIDACAO
+
+def calcular_backoff(tentativa):
+    """Retorna a espera (s) antes da próxima tentativa: exponencial com jitter total."""
+    teto = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (tentativa - 1)))
+    return random.uniform(0, teto)
+
+def registrar_falha_definitiva(indice, grupo, falha):
+    """Anota em ``FALHAS_FILE`` o grupo que não será mais reprocessado."""
+    classe, etapa, mensagem = falha
+    try:
+        with open(FALHAS_FILE, 'a') as f:
+            f.write(f"{indice};{grupo[0]['CPF']};{classe};{etapa};{mensagem.splitlines()[0] if mensagem else ''}\n")
+    except:
+        pass
+
+class DisjuntorServidor:
+    """Pausa todos os workers enquanto o servidor estiver fora do ar.
+
+    Quando aberto, apenas um worker sonda ``verificar_servidor`` com backoff;
+    os demais ficam bloqueados em ``aguardar`` até o servidor voltar.
+    """
+
+    def __init__(self, intervalo=BACKOFF_BASE, intervalo_max=BACKOFF_MAX):
+        """Cria o disjuntor fechado (servidor disponível)."""
+        self.intervalo = intervalo
+        self.intervalo_max = intervalo_max
+        self._liberado = threading.Event()
+        self._liberado.set()
+        self._sondagem = threading.Lock()
+    
+    def abrir(self):
+        """Interrompe o envio de novos grupos."""
+        if self._liberado.is_set():
+            print("🔌 Servidor indisponível: processamento pausado")
+            self._liberado.clear()
+    
+    def aguardar(self):
+        """Bloqueia até o servidor responder novamente."""
+        if self._liberado.is_set():
+            return
+        with self._sondagem:
+            espera = self.intervalo
+            while not self._liberado.is_set():
+                if verificar_servidor():
+                    print("🔋 Servidor respondeu: processamento retomado")
+                    self._liberado.set()
+                    break
+                print(f"⏳ Aguardando servidor por {espera:.0f}s...")
+                time.sleep(espera)
+                espera = min(espera * 2, self.intervalo_max)
+
 def salvar_checkpoint(indice):
     """Salva o checkpoint"""
     try:
@@ -74,36 +163,21 @@ def carregar_checkpoint():
     except:
         return -1
 
-def processar_dataframe(df):
-    """Processa o dataframe e agrupa por titular"""
-    grupos = []
-    grupo_atual = []
-    
-    for index, row in df.iterrows():
-        if pd.isna(row['NOME']) or pd.isna(row['DEPENDENCIA']) or pd.isna(row['CPF']):
-            continue
-            
-        dependencia = str(row['DEPENDENCIA']).strip().upper()
-        
-        if dependencia == 'TITULAR':
-            if grupo_atual:
-                grupos.append(grupo_atual)
-            grupo_atual = [row]
-        else:
-            if grupo_atual:
-                grupo_atual.append(row)
-    
-    if grupo_atual:
-        grupos.append(grupo_atual)
-    
-    return grupos
+def salvar_resolvidos(indices):
+    """Salva os índices já resolvidos além do checkpoint (um por linha)"""
+    try:
+        with open(RESOLVIDOS_FILE, 'w') as f:
+            f.write(''.join(f"{indice}\n" for indice in sorted(indices)))
+    except OSError:
+        pass
 
-def obter_valor(row):
-    """Retorna o valor monetário da linha considerando múltiplas colunas."""
-    for coluna in COLUNAS_VALOR:
-        if coluna in row and pd.notna(row[coluna]):
-            return row[coluna]
-    return '0,00'
+def carregar_resolvidos(checkpoint):
+    """Carrega os índices resolvidos depois do ``checkpoint``; ignora os já cobertos por ele"""
+    try:
+        with open(RESOLVIDOS_FILE, 'r') as f:
+            return {int(linha) for linha in f if linha.strip() and int(linha) > checkpoint}
+    except (OSError, ValueError):
+        return set()
 
 def mapear_dependencia(dependencia):
     """Mapeia dependência para opção do select"""
@@ -146,6 +220,7 @@ class EFDTestRunner:
     def __init__(self):
         """Inicializa o driver do Selenium."""
         self.driver = None
+        self.ultima_falha = None
         self.setup_driver()
     
     def setup_driver(self):
@@ -161,6 +236,10 @@ class EFDTestRunner:
         if self.driver:
             self.driver.quit()
     
+    def registrar_falha(self, etapa, exc):
+        """Guarda a classe da falha da etapa para o agendador de tentativas."""
+        self.ultima_falha = (classificar_falha(exc), etapa, str(exc))
+    
     def navegar_para_formulario(self):
         """Abre a página inicial e navega até o formulário."""
         try:
@@ -173,6 +252,7 @@ class EFDTestRunner:
             return True
         except Exception as e:
             print(f"⚠️ Falha ao navegar para o formulário: {e}")
+            self.registrar_falha('navegar_para_formulario', e)
             return False
     
     def preencher_dados_iniciais(self, cpf_titular):
@@ -193,6 +273,7 @@ class EFDTestRunner:
             return True
         except Exception as e:
             print(f"⚠️ Erro ao preencher dados iniciais: {e}")
+            self.registrar_falha('preencher_dados_iniciais', e)
             return False
     
     def continuar_para_proxima_etapa(self):
@@ -206,6 +287,7 @@ class EFDTestRunner:
             return True
         except Exception as e:
             print(f"⚠️ Erro ao avançar para a etapa 2: {e}")
+            self.registrar_falha('continuar_para_proxima_etapa', e)
             return False
     
     def adicionar_dependente(self, cpf_dependente, relacao, agregado_outros=None):
@@ -244,6 +326,7 @@ class EFDTestRunner:
             return True
         except Exception as e:
             print(f"⚠️ Erro ao adicionar dependente: {e}")
+            self.registrar_falha('adicionar_dependente', e)
             return False
     
     def adicionar_plano_saude(self, valor):
@@ -271,6 +354,7 @@ class EFDTestRunner:
             return True
         except Exception as e:
             print(f"⚠️ Erro ao adicionar plano de saúde: {e}")
+            self.registrar_falha('adicionar_plano_saude', e)
             return False
     
     def adicionar_informacao_dependente(self, cpf_dependente, valor):
@@ -298,6 +382,7 @@ class EFDTestRunner:
             return True
         except Exception as e:
             print(f"⚠️ Erro ao adicionar informações do dependente: {e}")
+            self.registrar_falha('adicionar_informacao_dependente', e)
             return False
     
     def enviar_declaracao(self):
@@ -312,10 +397,12 @@ class EFDTestRunner:
             return True
         except Exception as e:
             print(f"⚠️ Erro ao enviar declaração: {e}")
+            self.registrar_falha('enviar_declaracao', e)
             return False
     
     def processar_grupo(self, grupo):
         """Executa todas as etapas para um grupo (titular + dependentes)."""
+        self.ultima_falha = None
         try:
             titular = grupo[0]
             dependentes = grupo[1:] if len(grupo) > 1 else []
@@ -338,7 +425,8 @@ class EFDTestRunner:
                     # Se for "Agregado/Outros", usar a dependência original como descrição
                     agregado_outros = dependencia_original if relacao == 'Agregado/Outros' else None
                     
-                    self.adicionar_dependente(dep['CPF'], relacao, agregado_outros)
+                    if not self.adicionar_dependente(dep['CPF'], relacao, agregado_outros):
+                        return False
             
             # Adicionar plano de saúde
             valor_titular = obter_valor(titular)
@@ -349,26 +437,56 @@ class EFDTestRunner:
             for dep in dependentes:
                 if pd.notna(dep['CPF']):
                     valor_dep = obter_valor(dep)
-                    if valor_dep and str(valor_dep).strip() not in ('', '0', '0,00'):
-                        self.adicionar_informacao_dependente(dep['CPF'], valor_dep)
+                    if valor_dep != '0,00':
+                        if not self.adicionar_informacao_dependente(dep['CPF'], valor_dep):
+                            return False
             
             return self.enviar_declaracao()
         except Exception as e:
             print(f"⚠️ Erro geral ao processar grupo: {e}")
+            self.registrar_falha('processar_grupo', e)
             return False
 
+def executar_grupo(grupo, disjuntor):
+    """Roda um grupo em um navegador novo e retorna ``(sucesso, falha)``.
+
+    ``falha`` é ``(classe, etapa, mensagem)``; se o servidor não responder, o
+    disjuntor é aberto e a classe passa a ser ``FALHA_SERVIDOR``.
+    """
+    runner = None
+    try:
+        runner = EFDTestRunner()
+        resultado = runner.processar_grupo(grupo)
+        falha = runner.ultima_falha or (FALHA_VALIDACAO, 'processar_grupo', '')
+    except Exception as e:
+        resultado = False
+        falha = (classificar_falha(e), 'setup_driver', str(e))
+    finally:
+        if runner:
+            runner.close_driver()
+    
+    if resultado:
+        return True, None
+    
+    classe = falha[0]
+    if classe == FALHA_SERVIDOR or (classe in FALHAS_TRANSITORIAS and not verificar_servidor()):
+        classe = FALHA_SERVIDOR
+        disjuntor.abrir()
+    return False, (classe,) + tuple(falha[1:])
+
 def processar_todos_os_grupos():
-    """Executa o processamento sequencial de todos os grupos do Excel."""
+    """Processa todos os grupos do Excel, reprocessando falhas transitórias com backoff."""
     if not verificar_servidor():
         print("❌ Servidor Flask não está rodando em localhost:5000")
         print("Execute: python app.py")
         return
     
-    dados_limpos = limpar_dataframe(dados)
-    grupos = processar_dataframe(dados_limpos)
+    grupos = cache_entrada.carregar_grupos(ARQUIVO_DADOS)
     
     checkpoint = carregar_checkpoint()
     inicio = checkpoint + 1 if checkpoint >= 0 else 0
+    # Concluídos numa execução interrompida enquanto um grupo anterior aguardava reprocessamento
+    ja_resolvidos = carregar_resolvidos(checkpoint)
     
     if inicio >= len(grupos):
         print("✅ Todos os grupos já foram processados.")
@@ -377,29 +495,187 @@ def processar_todos_os_grupos():
     
     print(f"📊 Total de grupos: {len(grupos)}")
     print(f"▶️ Iniciando do grupo: {inicio + 1}")
+    if ja_resolvidos:
+        print(f"⏭️ {len(ja_resolvidos)} grupo(s) após o checkpoint já resolvidos anteriormente")
+    
+    conn_delta = delta.conectar()
+    if DELTA:
+        hashes_grupos, alterados, resumo = delta.comparar(grupos, delta.carregar_hashes(conn_delta))
+        print(delta.formatar_resumo(resumo))
+    else:
+        hashes_grupos, alterados = [hash_grupo(grupo) for grupo in grupos], range(len(grupos))
+    alterados = set(alterados)
+    
+    disjuntor = DisjuntorServidor()
+    pendentes = [
+        indice for indice in range(inicio, len(grupos)) if indice in alterados and indice not in ja_resolvidos
+    ][::-1]
+    reprocessar = []  # heap de (pronto_em, indice)
+    tentativas = {}
+    # Grupos sem alteração contam como resolvidos para o checkpoint
+    resolvidos = {indice for indice in range(inicio, len(grupos)) if indice not in alterados} | ja_resolvidos
+    proximo_checkpoint = inicio
+    definitivas = 0
+    i = inicio
     
     try:
         processados = 0
-        for i in range(inicio, len(grupos)):
-            print(f"\n🔄 Processando grupo {i + 1}/{len(grupos)}")
-            
-            runner = EFDTestRunner()
-            try:
-                resultado = runner.processar_grupo(grupos[i])
-                status = "✅ Sucesso" if resultado else "❌ Falha"
-                print(f"Resultado: {status}")
-                salvar_checkpoint(i)
-            finally:
-                runner.close_driver()
-            
-            processados += 1
-            if MAX_GRUPOS and processados >= MAX_GRUPOS:
-                print(f"⏹️ Limite de {MAX_GRUPOS} grupo(s) atingido (MAX_GRUPOS).")
+        while True:
+            disjuntor.aguardar()
+            
+            aceita_novos = bool(pendentes) and not (MAX_GRUPOS and processados >= MAX_GRUPOS)
+            if not aceita_novos and not reprocessar:
                 break
+            
+            agora = time.monotonic()
+            if reprocessar and (reprocessar[0][0] <= agora or not aceita_novos):
+                pronto_em, i = heapq.heappop(reprocessar)
+                if pronto_em > agora:
+                    time.sleep(pronto_em - agora)
+            else:
+                i = pendentes.pop()
+                processados += 1
+            
+            tentativas[i] = tentativas.get(i, 0) + 1
+            print(f"\n🔄 Processando grupo {i + 1}/{len(grupos)} (tentativa {tentativas[i]}/{MAX_TENTATIVAS})")
+            
+            resultado, falha = executar_grupo(grupos[i], disjuntor)
+            if resultado:
+                print("Resultado: ✅ Sucesso")
+                resolvidos.add(i)
+                ja_resolvidos.add(i)
+                delta.registrar_envios(conn_delta, [(grupos[i][0]['CPF'], hashes_grupos[i])])
+            else:
+                classe = falha[0]
+                if classe in FALHAS_TRANSITORIAS and tentativas[i] < MAX_TENTATIVAS:
+                    espera = calcular_backoff(tentativas[i])
+                    print(f"Resultado: 🔁 Falha transitória ({classe}), nova tentativa em {espera:.1f}s")
+                    heapq.heappush(reprocessar, (time.monotonic() + espera, i))
+                else:
+                    print(f"Resultado: ❌ Falha ({classe})")
+                    registrar_falha_definitiva(i, grupos[i], falha)
+                    definitivas += 1
+                    resolvidos.add(i)
+                    ja_resolvidos.add(i)
+            
+            # O checkpoint só avança sobre grupos resolvidos (sucesso ou falha definitiva);
+            # os resolvidos além dele ficam registrados para não serem reenviados na retomada
+            while proximo_checkpoint in resolvidos:
+                proximo_checkpoint += 1
+            if proximo_checkpoint > inicio:
+                salvar_checkpoint(proximo_checkpoint - 1)
+            ja_resolvidos = {indice for indice in ja_resolvidos if indice >= proximo_checkpoint}
+            salvar_resolvidos(ja_resolvidos)
+        
+        if pendentes:
+            print(f"⏹️ Limite de {MAX_GRUPOS} grupo(s) atingido (MAX_GRUPOS).")
+        if definitivas:
+            print(f"\n⚠️ {definitivas} grupo(s) com falha definitiva registrados em {FALHAS_FILE}")
                 
     except KeyboardInterrupt:
         print(f"\n⏸️ Pausado no grupo {i + 1}")
         print("Execute novamente para continuar")
+    finally:
+        conn_delta.close()
+
+def chamar_coordenador(rota, payload):
+    """Envia um POST JSON ao coordenador e devolve a resposta decodificada."""
+    requisicao = urllib.request.Request(
+        COORDENADOR_URL.rstrip('/') + rota,
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(requisicao, timeout=30) as resposta:
+        return json.loads(resposta.read().decode('utf-8'))
+
+def chamar_coordenador_ate_responder(rota, payload):
+    """Como ``chamar_coordenador``, mas insiste com backoff enquanto o coordenador estiver fora.
+
+    Erros de rede e respostas 5xx (coordenador reiniciando) são repetidos;
+    outros ``HTTPError`` (ex.: 409 de lease expirado) são relançados.
+    """
+    espera = BACKOFF_BASE
+    while True:
+        try:
+            return chamar_coordenador(rota, payload)
+        except urllib.error.HTTPError as e:
+            if e.code < 500:
+                raise
+            motivo = f"HTTP {e.code}"
+        except (urllib.error.URLError, OSError) as e:
+            motivo = e
+        print(f"⚠️ Coordenador indisponível ({motivo}); nova tentativa em {espera:.0f}s")
+        time.sleep(espera)
+        espera = min(espera * 2, BACKOFF_MAX)
+
+def executar_worker(nome=None):
+    """Processa grupos arrendados do coordenador até o lote acabar."""
+    nome = nome or f"{socket.gethostname()}-{os.getpid()}"
+    disjuntor = DisjuntorServidor()
+    processados = 0
+    print(f"👷 Worker {nome} conectado a {COORDENADOR_URL}")
+    
+    try:
+        while True:
+            disjuntor.aguardar()
+            lease = chamar_coordenador_ate_responder('/coordenador/lease', {
+                'worker': nome, 'quantidade': TAMANHO_LEASE, 'timeout': LEASE_TIMEOUT
+            })
+            
+            if not lease['grupos']:
+                if lease['restantes'] == 0:
+                    print(f"✅ Lote concluído. Grupos processados por {nome}: {processados}")
+                    return
+                # Restam grupos arrendados a outros workers ou aguardando backoff
+                time.sleep(BACKOFF_BASE)
+                continue
+            
+            for item in lease['grupos']:
+                disjuntor.aguardar()
+                indice = item['indice']
+                print(f"\n🔄 Processando grupo {indice + 1} (lease {lease['lease_id'][:8]})")
+                resultado, falha = executar_grupo(item['grupo'], disjuntor)
+                
+                relatorio = {'lease_id': lease['lease_id'], 'indice': indice, 'sucesso': resultado}
+                if resultado:
+                    print("Resultado: ✅ Sucesso")
+                else:
+                    classe, etapa, mensagem = falha
+                    print(f"Resultado: ❌ Falha ({classe})")
+                    relatorio.update({
+                        'classe': classe,
+                        'etapa': etapa,
+                        'mensagem': mensagem.splitlines()[0] if mensagem else '',
+                        'reprocessar': classe in FALHAS_TRANSITORIAS,
+                        'espera': calcular_backoff(item.get('tentativas', 1))
+                    })
+                
+                # Perder este relatório faria o grupo voltar à fila e ser enviado de novo
+                try:
+                    chamar_coordenador_ate_responder('/coordenador/resultado', relatorio)
+                except urllib.error.HTTPError as e:
+                    if e.code != 409:
+                        raise
+                    # Lease expirou e o grupo foi reatribuído; descarta o restante
+                    print("⚠️ Lease expirado; solicitando novos grupos")
+                    break
+                processados += 1
+                try:
+                    chamar_coordenador('/coordenador/renovar', {'lease_id': lease['lease_id'], 'timeout': LEASE_TIMEOUT})
+                except (urllib.error.URLError, OSError) as e:
+                    # Sem renovação o lease pode expirar; o próximo relatório recebe 409
+                    print(f"⚠️ Não foi possível renovar o lease ({e})")
+    except KeyboardInterrupt:
+        print(f"\n⏸️ Worker {nome} interrompido; grupos em aberto voltam à fila quando o lease expirar")
 
 if __name__ == "__main__":
-    processar_todos_os_grupos()
+    parser = argparse.ArgumentParser(description="Automação do formulário EFD-REINF")
+    parser.add_argument('--worker', action='store_true',
+                        help="processa grupos distribuídos pelo coordenador (POST /coordenador/carregar antes)")
+    parser.add_argument('--nome', help="identificação do worker (padrão: host-pid)")
+    args = parser.parse_args()
+    
+    if args.worker:
+        executar_worker(args.nome)
+    else:
+        processar_todos_os_grupos()
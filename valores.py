@@ -0,0 +1,171 @@
+"""Conversão de valores monetários para centavos inteiros (ponto fixo).
+
+Os valores chegam como texto no padrão brasileiro (``1.234,56``, ``200,00``)
+ou como números vindos do pandas. Eles são convertidos uma única vez para
+centavos inteiros e só voltam a ser texto na hora de exibir, evitando o
+vai-e-volta com ``float`` e o acúmulo de erros de arredondamento nos totais.
+"""
+
+import numbers
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+
+_PADRAO_DECIMAL = re.compile(r'^(-)?(\d*)(?:\.(\d*))?$')
+_PADRAO_MILHAR = re.compile(r'^-?\d{1,3}(?:\.\d{3})+$')
+
+# Centavos cabem em INTEGER do SQLite e em int64 do pandas
+CENTAVOS_MAXIMO = 2 ** 63 - 1
+# Acima disso ``int64`` perde precisão no caminho vetorizado; esses valores vão para o escalar
+_DIGITOS_SEGUROS = 16
+
+
+def _normalizar_texto(texto):
+    """Remove símbolo da moeda/espaços e deixa o ponto como separador decimal."""
+    texto = texto.strip().replace('R$', '').replace(' ', '')
+    if ',' in texto:
+        return texto.replace('.', '').replace(',', '.')
+    if _PADRAO_MILHAR.match(texto):
+        # "1.234" sem vírgula é separador de milhar, não decimal
+        return texto.replace('.', '')
+    return texto
+
+
+def _centavos_de_partes(sinal, inteiro, fracao):
+    """Monta os centavos a partir das partes do número, arredondando a 3ª casa."""
+    fracao = fracao or ''
+    centavos = int(inteiro or 0) * 100 + int(fracao[:2].ljust(2, '0'))
+    if len(fracao) > 2 and fracao[2] >= '5':
+        centavos += 1
+    return -centavos if sinal else centavos
+
+
+def _verificar_faixa(centavos, valor):
+    """Devolve ``centavos`` ou levanta ``ValueError`` se não couber em 64 bits."""
+    if abs(centavos) > CENTAVOS_MAXIMO:
+        raise ValueError(f"Valor monetário fora da faixa suportada: {valor!r}")
+    return centavos
+
+
+def _numero_para_centavos(valor):
+    """Centavos de um ``float`` pelo seu texto decimal, arredondando a 3ª casa como o texto.
+
+    ``round(valor * 100)`` arredondaria ``0.125`` para ``12`` (meio para o par,
+    sobre o binário) enquanto ``'0,125'`` vira ``13``.
+    """
+    valor = float(valor)
+    if valor != valor:  # NaN
+        return 0
+    if valor in (float('inf'), float('-inf')):
+        raise ValueError(f"Valor monetário fora da faixa suportada: {valor!r}")
+    centavos = int(Decimal(repr(valor)).scaleb(2).quantize(Decimal(1), ROUND_HALF_UP))
+    return _verificar_faixa(centavos, valor)
+
+
+def para_centavos(valor):
+    """Converte um valor monetário (texto ou número) para centavos inteiros.
+
+    Valores vazios ou inválidos resultam em ``0``, mantendo o comportamento
+    do antigo ``formatar_valor`` que devolvia ``'0,00'``. Números e textos
+    arredondam igual (meio para cima na 3ª casa). Levanta ``ValueError`` se o
+    resultado não couber em 64 bits.
+    """
+    if valor is None:
+        return 0
+    if isinstance(valor, bool):
+        return 0
+    if isinstance(valor, numbers.Integral):
+        return _verificar_faixa(int(valor) * 100, valor)
+    if isinstance(valor, numbers.Real):
+        return _numero_para_centavos(valor)
+    texto = _normalizar_texto(str(valor))
+    encontrado = _PADRAO_DECIMAL.match(texto)
+    if not encontrado or not (encontrado.group(2) or encontrado.group(3)):
+        return 0
+    return _verificar_faixa(_centavos_de_partes(*encontrado.groups()), valor)
+
+
+def _numeros_para_centavos(numeros):
+    """Versão vetorizada de ``_numero_para_centavos`` para um array de ``float64``.
+
+    ``round(valor * 100)`` só diverge do arredondamento decimal quando o valor
+    está (quase) exatamente no meio de dois centavos ou é grande demais para
+    ``float64`` guardar os centavos; só esses casos passam pelo ``Decimal``.
+    """
+    numeros = np.asarray(numeros, dtype='float64')
+    escalados = numeros * 100
+    if not np.isfinite(escalados[~np.isnan(escalados)]).all():
+        raise ValueError("Valor monetário fora da faixa suportada")
+    duvidosos = (np.abs(np.abs(escalados - np.trunc(escalados)) - 0.5) < 1e-6) | (np.abs(escalados) >= 2.0 ** 52)
+    centavos = np.where(np.isnan(escalados) | duvidosos, 0, np.round(escalados)).astype('int64')
+    posicoes = np.flatnonzero(duvidosos)
+    centavos[posicoes] = [_numero_para_centavos(valor) for valor in numeros[posicoes].tolist()]
+    return pd.arrays.IntegerArray(centavos, np.isnan(numeros))
+
+
+def serie_para_centavos(serie):
+    """Converte uma coluna do pandas para centavos (``Int64``) de forma vetorizada.
+
+    Aceita células numéricas e textos como ``1.234,56`` ou ``200,00``. Células
+    nulas continuam nulas (``<NA>``) para que o chamador decida o fallback;
+    textos inválidos viram ``0``.
+    """
+    if pd.api.types.is_integer_dtype(serie):
+        maior = serie.abs().max() if len(serie) else 0
+        if pd.notna(maior) and int(maior) > CENTAVOS_MAXIMO // 100:
+            raise ValueError(f"Valor monetário fora da faixa suportada: {maior!r}")
+        return serie.astype('Int64') * 100
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return pd.Series(_numeros_para_centavos(serie.to_numpy(dtype='float64', na_value=np.nan)), index=serie.index)
+
+    # valores monetários se repetem muito: converte só os distintos e espalha
+    codigos, distintos = pd.factorize(serie)
+    if len(distintos) < len(serie):
+        centavos = _texto_para_centavos(pd.Series(distintos, dtype=object)).to_numpy()
+        return pd.Series(
+            pd.array(centavos, dtype='Int64').take(codigos, allow_fill=True), index=serie.index
+        )
+    return _texto_para_centavos(serie)
+
+
+def _texto_para_centavos(serie):
+    """Conversão elemento a elemento usada por ``serie_para_centavos``."""
+    nulos = serie.isna()
+    numericos = serie.map(lambda v: isinstance(v, numbers.Real) and not isinstance(v, bool)) & ~nulos
+    texto = serie.astype(str).str.strip().str.replace('R$', '', regex=False)
+    texto = texto.str.replace(' ', '', regex=False)
+
+    com_virgula = texto.str.contains(',', regex=False)
+    milhar = texto.str.match(_PADRAO_MILHAR.pattern)
+    texto = texto.mask(com_virgula, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    texto = texto.mask(~com_virgula & milhar, texto.str.replace('.', '', regex=False))
+
+    partes = texto.str.extract(_PADRAO_DECIMAL.pattern)
+    sinal, inteiro, fracao = partes[0], partes[1].fillna(''), partes[2].fillna('')
+    validos = partes[1].notna() & ((inteiro != '') | (fracao != ''))
+
+    # partes inteiras longas estourariam o int64 sem aviso; vão para o caminho escalar
+    longos = validos & (inteiro.str.lstrip('0').str.len() > _DIGITOS_SEGUROS)
+    inteiro = inteiro.mask(longos, '0')
+    inteiro = pd.to_numeric(inteiro.where(inteiro != '', '0'), errors='coerce').fillna(0).astype('int64')
+    centavos_frac = pd.to_numeric(fracao.str[:2].str.ljust(2, '0'), errors='coerce').fillna(0).astype('int64')
+    arredonda = (fracao.str[2:3] >= '5').astype('int64')
+
+    centavos = inteiro * 100 + centavos_frac + arredonda
+    centavos = centavos.where(sinal.isna(), -centavos)
+    centavos = centavos.where(validos, 0).astype('Int64')
+    if longos.any():
+        centavos[longos] = [para_centavos(valor) for valor in serie[longos]]
+    if numericos.any():
+        centavos[numericos] = _numeros_para_centavos(pd.to_numeric(serie[numericos]).to_numpy(dtype='float64'))
+    return centavos.mask(nulos)
+
+
+def formatar_centavos(centavos):
+    """Formata centavos inteiros no padrão brasileiro com duas casas (``1234,56``)."""
+    centavos = 0 if centavos is None or pd.isna(centavos) else int(centavos)
+    sinal = '-' if centavos < 0 else ''
+    inteiro, resto = divmod(abs(centavos), 100)
+    return f"{sinal}{inteiro},{resto:02d}"